@@ -1,7 +1,8 @@
 from django.contrib import admin
 from adminsortable2.admin import SortableAdminMixin
 
-from .models import Jar, JarTag, JarAlbum
+from .models import Jar, JarTag, JarAlbum, PollRun
+from .utils import invalidate_jars_cache
 
 
 class JarAlbumAdmin(admin.StackedInline):
@@ -19,7 +20,24 @@ class JarAdmin(SortableAdminMixin, admin.ModelAdmin):
     exclude = ['dd_order']
     ordering = ['-dd_order', '-date_added']
 
+    def _update_order(self, updated_items, extra_model_filters):
+        """Invalidates cached jar responses, as reordering bypasses model signals"""
+        updated = super()._update_order(updated_items, extra_model_filters)
+        invalidate_jars_cache()
+        return updated
+
+    def _bulk_move(self, request, queryset, method):
+        """Invalidates cached jar responses, as moving between pages bypasses model signals"""
+        super()._bulk_move(request, queryset, method)
+        invalidate_jars_cache()
+
 
 @admin.register(JarTag)
 class JarTagAdmin(admin.ModelAdmin):
     list_display = ['name']
+
+
+@admin.register(PollRun)
+class PollRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'started_at', 'finished_at', 'jars_polled', 'jars_total']
+    readonly_fields = ['status', 'started_at', 'finished_at', 'jars_polled', 'jars_total']
@@ -0,0 +1,100 @@
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+
+
+class FakeMonobankHandler(BaseHTTPRequestHandler):
+    """
+    Request handler answering jar state requests like the monobank jar API.
+
+    The sum of every jar grows by a random amount on each request. The behaviour is taken
+    from the attributes of the server, see `FakeMonobankServer`.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            monobank_id = json.loads(self.rfile.read(length))['clientId']
+        except (ValueError, KeyError, TypeError):
+            return self.send_json(400, {'errorDescription': 'clientId is required'})
+
+        server = self.server
+        sleep(random.uniform(server.latency, server.latency + server.jitter))
+        if random.random() < server.throttle_rate:
+            return self.send_json(429, {'errorDescription': 'Too many requests'},
+                                  headers={'Retry-After': str(server.retry_after)})
+        if random.random() < server.error_rate:
+            return self.send_json(503, {'errorDescription': 'Service unavailable'})
+
+        with server.lock:
+            server.sums[monobank_id] = server.sums.get(monobank_id, 0) + random.randint(0, 10000)
+            amount = server.sums[monobank_id]
+        self.send_json(200, {
+            'jarId': monobank_id,
+            'jarAmount': amount,
+            'jarGoal': server.goal,
+            'jarStatus': 'ACTIVE',
+        })
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keeps the benchmark output clean."""
+
+
+class FakeMonobankServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the monobank jar API, served from a background thread.
+
+    Parameters:
+        - latency (float): The minimal response time, in seconds.
+        - jitter (float): The maximal random addition to the response time, in seconds.
+        - error_rate (float): Share of requests answered with 503.
+        - throttle_rate (float): Share of requests answered with 429.
+        - retry_after (int): The Retry-After header of the 429 responses, in seconds.
+        - goal (int | None): The goal sum of every jar.
+
+    Example:
+        with FakeMonobankServer(latency=0.05, error_rate=0.01) as server:
+            requests.post(server.url, json={'clientId': 'abcdef'})
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=0, goal=None,
+                 host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeMonobankHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.goal = goal
+        self.sums = {}
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/bank/jar'
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
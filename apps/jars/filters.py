@@ -1,7 +1,7 @@
-from django.db.models import QuerySet, F, OuterRef, Subquery
+from django.db.models import QuerySet
 from django_filters import rest_framework as filters
 
-from .models import Jar, AmountOfJar, JarTag
+from .models import Jar, JarTag
 
 ORDERING_CHOICES = (
     ('fill_percentage', 'fill_percentage - ascending'),
@@ -15,15 +15,17 @@ class JarFilter(filters.FilterSet):
     """
     Filter for Jar model.
 
-    Supports filtering by fill percentage.
+    Supports ordering by fill percentage or date and filtering by a fill percentage range.
 
     Example:
     ```
-    /api/jars/?fill_percentage=-fill_percentage&tags=name
+    /api/jars/?ordering=-fill_percentage&fill_min=80&tags=name
     ```
 
     Query Parameters:
-        - `fill_percentage`: Filter jars by fill percentage.
+        - `ordering`: Order jars by fill percentage or date.
+        - `fill_min`: Minimal fill percentage of jars.
+        - `fill_max`: Maximal fill percentage of jars.
         - `tags`: Filter by tags name.
 
     Choices:
@@ -35,6 +37,14 @@ class JarFilter(filters.FilterSet):
         choices=ORDERING_CHOICES,
         method='ordering_by_fill_percentage_or_date'
     )
+    fill_min = filters.NumberFilter(
+        field_name='fill_percentage',
+        lookup_expr='gte',
+    )
+    fill_max = filters.NumberFilter(
+        field_name='fill_percentage',
+        lookup_expr='lte',
+    )
     tags = filters.ModelChoiceFilter(
         queryset=JarTag.objects.all(),
         field_name="tags",
@@ -43,11 +53,11 @@ class JarFilter(filters.FilterSet):
 
     class Meta:
         model = Jar
-        fields = ['ordering', 'tags']
+        fields = ['ordering', 'fill_min', 'fill_max', 'tags']
 
     def ordering_by_fill_percentage_or_date(self, queryset, name, value) -> QuerySet:
         """
-        Filter jars based on fill percentage.
+        Order jars by the materialized fill percentage or by date.
 
         Args:
             queryset (QuerySet): The queryset to be filtered.
@@ -57,10 +67,4 @@ class JarFilter(filters.FilterSet):
         Returns:
             QuerySet: The filtered queryset.
         """
-        subquery = AmountOfJar.objects.filter(
-            jar=OuterRef('pk')).order_by('-date_added')
-        queryset = queryset.annotate(
-            latest_sum=Subquery(subquery.values('sum')[:1]),
-            fill_percentage=F('latest_sum') * 100.0 / F('goal'),
-        ).order_by(value)
-        return queryset
+        return queryset.order_by(value)
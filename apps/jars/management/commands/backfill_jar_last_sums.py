@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from apps.jars.models import AmountOfJar, Jar
+
+
+class Command(BaseCommand):
+    """
+    Populates the denormalized `last_sum`, `last_incomes`, `date_last_polled` and
+    `fill_percentage` fields of every Jar from its latest AmountOfJar snapshot.
+
+    The fields are filled by the migrations adding them; the command re-syncs them later,
+    e.g. after snapshots were imported or deleted.
+
+    Example:
+    ```
+    python manage.py backfill_jar_last_sums --batch-size 500
+    ```
+    """
+    help = 'Populate the latest snapshot fields of jars from AmountOfJar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of jars updated per query.',
+        )
+
+    def handle(self, *args, **options):
+        latest = AmountOfJar.objects.filter(jar=OuterRef('pk')).order_by('-date_added', '-id')
+        jars = Jar.objects.annotate(
+            latest_sum=Subquery(latest.values('sum')[:1]),
+            latest_incomes=Subquery(latest.values('incomes')[:1]),
+            latest_date=Subquery(latest.values('date_added')[:1]),
+        ).only('pk', 'goal')
+
+        batch = []
+        updated = 0
+        for jar in jars.iterator(chunk_size=options['batch_size']):
+            jar.last_sum = jar.latest_sum or 0
+            jar.last_incomes = jar.latest_incomes or 0
+            jar.date_last_polled = jar.latest_date
+            jar.fill_percentage = jar.calculate_fill_percentage()
+            batch.append(jar)
+            if len(batch) >= options['batch_size']:
+                updated += self._flush(batch)
+        updated += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled latest snapshot fields for {updated} jars.'))
+
+    @staticmethod
+    def _flush(batch) -> int:
+        """Write the collected jars in one query and empty the batch."""
+        count = len(batch)
+        if count:
+            Jar.objects.bulk_update(batch, ['last_sum', 'last_incomes', 'date_last_polled', 'fill_percentage'])
+            batch.clear()
+        return count
@@ -0,0 +1,156 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from secrets import token_hex
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from apps.jars.fake_monobank import FakeMonobankServer
+from apps.jars.models import AmountOfJar, Jar
+from apps.jars.tasks import JarDataUnavailable, create_session, get_jar_data
+from apps.user.models import User, VolunteerInfo
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the poller against a local fake monobank API, without network access.
+
+    Seeds the given number of jars, fetches their states concurrently from a `FakeMonobankServer`
+    with the poller's HTTP session and writes them with `AmountOfJar.objects.ingest_batch` in
+    batches, as the snapshot writer does. The shared rate limiter and the Redis queue are
+    bypassed, so the result is the throughput of the fetch and write path alone. Everything
+    written to the database is rolled back.
+
+    Reports the jars per second, the p50/p99 latency of fetching one jar (including retries)
+    and the number of database queries per jar.
+
+    Example:
+    ```
+    python manage.py benchmark_poller --jars 1000 --concurrency 20 --latency 0.05 --error-rate 0.01
+    ```
+    """
+    help = 'Benchmark the poller against a local fake monobank API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jars', type=int, default=500, help='Number of seeded jars.')
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of jars fetched at once.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SNAPSHOT_BATCH_SIZE,
+            help='Number of jar states written at once.',
+        )
+        parser.add_argument('--latency', type=float, default=0.05, help='Response time of the fake API, in seconds.')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Random addition to the response time.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503.')
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with 429.')
+        parser.add_argument('--retry-after', type=int, default=0, help='Retry-After of the 429 responses.')
+        parser.add_argument(
+            '--backoff-factor',
+            type=float,
+            default=0.0,
+            help='Backoff factor of the retries (MONOBANK_BACKOFF_FACTOR in production).',
+        )
+
+    def handle(self, *args, **options):
+        if options['jars'] < 1:
+            raise CommandError('Seed at least one jar.')
+
+        server = FakeMonobankServer(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            throttle_rate=options['throttle_rate'],
+            retry_after=options['retry_after'],
+            goal=10 ** 7,
+        )
+        poller_settings = override_settings(
+            MONOBANK_API_JAR=server.url,
+            MONOBANK_JAR_POST_BODY=json.dumps({'c': 'benchmark'}),
+            MONOBANK_BACKOFF_FACTOR=options['backoff_factor'],
+            MONOBANK_POOL_SIZE=options['concurrency'],
+        )
+        with server, poller_settings, transaction.atomic():
+            jars = self.seed_jars(options['jars'])
+            result = self.run_pipeline(jars, options['concurrency'], options['batch_size'])
+            transaction.set_rollback(True)
+
+        self.report(result, options['jars'])
+
+    @staticmethod
+    def seed_jars(count) -> list[tuple]:
+        """Creates the benchmarked jars of a new volunteer and returns their ids and monobank ids."""
+        prefix = token_hex(4)
+        user = User.objects.create_user(f'benchmark-{prefix}@example.com', token_hex(16))
+        volunteer = VolunteerInfo.objects.create(
+            user=user, public_name='benchmark', first_name='benchmark', last_name='benchmark', active=True)
+        Jar.objects.bulk_create([
+            Jar(monobank_id=f'bench-{prefix}-{number:08d}', title=f'Benchmark {number}', description='benchmark',
+                volunteer=volunteer)
+            for number in range(count)
+        ], batch_size=1000)
+        return list(Jar.objects.filter(volunteer=volunteer).values_list('pk', 'monobank_id'))
+
+    @staticmethod
+    def run_pipeline(jars, concurrency, batch_size) -> dict:
+        """
+        Fetches the jar states concurrently and writes them in batches as they arrive.
+
+        Returns:
+            dict: The runtime, the fetch latencies, the number of failed fetches and of queries.
+        """
+        session = create_session()
+
+        def fetch(jar):
+            jar_id, monobank_id = jar
+            started = perf_counter()
+            try:
+                data = get_jar_data(monobank_id, session=session)
+            except JarDataUnavailable:
+                data = None
+            return jar_id, data, perf_counter() - started
+
+        latencies = []
+        failed = 0
+        batch = []
+        started = perf_counter()
+        with CaptureQueriesContext(connection) as queries, ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for jar_id, data, latency in executor.map(fetch, jars):
+                latencies.append(latency)
+                if data is None:
+                    failed += 1
+                    continue
+                batch.append((jar_id, data.get('jarAmount', 0), data.get('jarStatus'), data.get('jarGoal')))
+                if len(batch) >= batch_size:
+                    AmountOfJar.objects.ingest_batch(batch, dedup=settings.SNAPSHOT_DEDUP)
+                    batch = []
+            if batch:
+                AmountOfJar.objects.ingest_batch(batch, dedup=settings.SNAPSHOT_DEDUP)
+
+        return {
+            'runtime': perf_counter() - started,
+            'latencies': sorted(latencies),
+            'failed': failed,
+            'queries': len(queries),
+        }
+
+    def report(self, result, count):
+        latencies = result['latencies']
+        self.stdout.write(
+            f'{count} jars in {result["runtime"]:.2f}s: {count / result["runtime"]:.1f} jars/s, '
+            f'{result["failed"]} failed'
+        )
+        self.stdout.write(
+            f'latency p50 {self.percentile(latencies, 50) * 1000:.1f}ms, '
+            f'p99 {self.percentile(latencies, 99) * 1000:.1f}ms'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{result["queries"] / count:.2f} queries per jar'))
+
+    @staticmethod
+    def percentile(values, percent) -> float:
+        """Returns the nearest-rank percentile of the sorted values."""
+        index = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+        return values[index]
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from apps.jars.models import AmountOfJar, Jar
+
+
+INDEX_NAME = 'amount_jar_latest_idx'
+
+
+class Command(BaseCommand):
+    """
+    Runs EXPLAIN for the hot AmountOfJar queries and checks that each of them uses
+    the `amount_jar_latest_idx` composite index.
+
+    Fails with a non-zero exit code if a query plan does not use the index, so it can be
+    run as a regression check after schema changes.
+
+    Example:
+    ```
+    python manage.py explain_amount_of_jar_queries --jar 1
+    ```
+    """
+    help = 'Check that the hot AmountOfJar queries use the composite index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jar',
+            type=int,
+            help='ID of the jar used in the queries (the first jar by default).',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full query plans.',
+        )
+
+    def handle(self, *args, **options):
+        jar_id = options['jar'] or Jar.objects.values_list('pk', flat=True).order_by('pk').first()
+        if jar_id is None:
+            raise CommandError('There are no jars to explain the queries for.')
+
+        failed = []
+        for name, queryset in self.get_queries(jar_id).items():
+            plan = queryset.explain()
+            uses_index = INDEX_NAME in plan
+            style = self.style.SUCCESS if uses_index else self.style.ERROR
+            self.stdout.write(style(f'{name}: {"uses" if uses_index else "does not use"} {INDEX_NAME}'))
+            if options['verbose_plans'] or not uses_index:
+                self.stdout.write(plan)
+            if not uses_index:
+                failed.append(name)
+
+        if failed:
+            raise CommandError(f'Queries not using {INDEX_NAME}: {", ".join(failed)}')
+
+    @staticmethod
+    def get_queries(jar_id) -> dict:
+        """
+        Returns the hot AmountOfJar queries by name.
+        """
+        latest = AmountOfJar.objects.filter(jar=OuterRef('pk')).order_by('-date_added')
+        week_ago = timezone.now() - timedelta(days=7)
+        return {
+            'latest snapshot of jar': AmountOfJar.objects.filter(jar=jar_id).order_by(
+                '-date_added').values('sum', 'incomes', 'date_added')[:1],
+            'latest snapshot per jar': Jar.objects.filter(pk=jar_id).annotate(
+                latest_sum=Subquery(latest.values('sum')[:1])).values('pk', 'latest_sum'),
+            'statistic list': AmountOfJar.objects.filter(jar=jar_id).only(
+                'id', 'sum', 'incomes', 'date_added'),
+            'statistic period': AmountOfJar.objects.filter(
+                jar=jar_id, date_added__gte=week_ago).values('sum', 'incomes', 'date_added'),
+        }
@@ -0,0 +1,118 @@
+import json
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from requests.adapters import HTTPAdapter
+
+from apps.jars.models import Jar
+from apps.jars.permissions import sign_webhook_body
+
+
+class Command(BaseCommand):
+    """
+    Load tests the jar state push endpoint as a fake monobank upstream.
+
+    Sends signed batches of random jar states of the open jars (or the given monobank ids)
+    concurrently and reports the throughput, the p50/p99 latency and the response statuses.
+
+    Example:
+    ```
+    python manage.py push_fake_jar_states --url http://localhost:8000/api/jars/ingest/ --requests 2000 --concurrency 16
+    ```
+    """
+    help = 'Load test the jar state push endpoint with signed fake jar states.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://localhost:8000/api/jars/ingest/',
+            help='URL of the push endpoint.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Number of requests sent.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Number of jar states per request.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Number of requests sent at once.',
+        )
+        parser.add_argument(
+            '--monobank-id',
+            action='append',
+            help='Monobank id of a pushed jar, may be repeated (the open jars by default).',
+        )
+        parser.add_argument(
+            '--secret',
+            default=settings.MONOBANK_WEBHOOK_SECRET,
+            help='The signing secret (MONOBANK_WEBHOOK_SECRET by default).',
+        )
+
+    def handle(self, *args, **options):
+        if not options['secret']:
+            raise CommandError('Set MONOBANK_WEBHOOK_SECRET or pass --secret.')
+        monobank_ids = options['monobank_id'] or list(
+            Jar.objects.filter(date_closed=None).values_list('monobank_id', flat=True))
+        if not monobank_ids:
+            raise CommandError('There are no jars to push states for.')
+
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_maxsize=options['concurrency']))
+        session.mount('https://', HTTPAdapter(pool_maxsize=options['concurrency']))
+
+        def push(_):
+            body = json.dumps([
+                {'jarId': monobank_id, 'jarAmount': random.randint(0, 10 ** 7), 'jarGoal': None, 'jarStatus': 'ACTIVE'}
+                for monobank_id in random.choices(monobank_ids, k=options['batch_size'])
+            ]).encode('utf-8')
+            timestamp = str(int(time()))
+            headers = {
+                'Content-Type': 'application/json',
+                'X-Timestamp': timestamp,
+                'X-Signature': sign_webhook_body(options['secret'], timestamp, body),
+            }
+            started = perf_counter()
+            try:
+                status = session.post(options['url'], data=body, headers=headers, timeout=30).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            return perf_counter() - started, status
+
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(push, range(options['requests'])))
+        runtime = perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        statuses = Counter(status for _, status in results)
+        sent = len(results)
+        self.stdout.write(
+            f'{sent} requests ({sent * options["batch_size"]} jar states) in {runtime:.2f}s: '
+            f'{sent / runtime:.1f} requests/s, {sent * options["batch_size"] / runtime:.1f} jar states/s'
+        )
+        self.stdout.write(
+            f'latency p50 {self.percentile(latencies, 50) * 1000:.1f}ms, '
+            f'p99 {self.percentile(latencies, 99) * 1000:.1f}ms'
+        )
+        style = self.style.SUCCESS if set(statuses) == {202} else self.style.ERROR
+        self.stdout.write(style(f'statuses: {dict(statuses)}'))
+
+    @staticmethod
+    def percentile(values, percent) -> float:
+        """Returns the nearest-rank percentile of the sorted values."""
+        index = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+        return values[index]
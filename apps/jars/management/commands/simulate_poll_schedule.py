@@ -0,0 +1,129 @@
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.jars.models import AmountOfJar, Jar
+from apps.jars.scheduler import VELOCITY_WINDOW, calculate_poll_interval, get_velocity
+
+
+class Command(BaseCommand):
+    """
+    Replays the AmountOfJar history of jars against the adaptive poll scheduler and compares
+    it with polling every jar once a day.
+
+    Every snapshot with non-zero incomes is treated as a change of the sum at its `date_added`.
+    For both schedules the command reports the number of polls and the average delay between
+    a change and the first poll which sees it. As the history was itself polled on a schedule,
+    the change times are only as precise as the polls which recorded them.
+
+    Example:
+    ```
+    python manage.py simulate_poll_schedule --days 30 --jar 1 --jar 2
+    ```
+    """
+    help = 'Simulate the adaptive poll schedule against the AmountOfJar history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jar',
+            type=int,
+            action='append',
+            help='ID of a jar to simulate, may be repeated (all jars by default).',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Simulate only the last number of days of the history.',
+        )
+        parser.add_argument(
+            '--fixed-interval',
+            type=int,
+            default=24 * 60 * 60,
+            help='Interval of the fixed schedule to compare with, in seconds.',
+        )
+        parser.add_argument(
+            '--verbose-jars',
+            action='store_true',
+            help='Print the results of every jar.',
+        )
+
+    def handle(self, *args, **options):
+        jars = Jar.objects.only('pk', 'title', 'goal', 'date_added')
+        if options['jar']:
+            jars = jars.filter(pk__in=options['jar'])
+        jars = jars.in_bulk()
+        if not jars:
+            raise CommandError('There are no jars to simulate.')
+
+        history = AmountOfJar.objects.filter(jar__in=jars.keys()).order_by('jar_id', 'date_added')
+        if options['days']:
+            end = history.order_by('-date_added').values_list('date_added', flat=True).first()
+            if end:
+                history = history.filter(date_added__gte=end - timedelta(days=options['days']))
+        history = history.values_list('jar_id', 'date_added', 'last_seen', 'sum', 'incomes')
+
+        fixed_interval = timedelta(seconds=options['fixed_interval'])
+        totals = {'adaptive': [0, timedelta(), 0], 'fixed': [0, timedelta(), 0]}
+        for jar_id, rows in groupby(history.iterator(), key=lambda row: row[0]):
+            rows = list(rows)
+            jar = jars[jar_id]
+            adaptive = self.simulate(jar, rows, self.adaptive_interval)
+            fixed = self.simulate(jar, rows, lambda *_: fixed_interval)
+            for name, result in (('adaptive', adaptive), ('fixed', fixed)):
+                totals[name] = [total + value for total, value in zip(totals[name], result)]
+            if options['verbose_jars']:
+                self.stdout.write(
+                    f'{jar}: {self.format_result(adaptive)} adaptive, {self.format_result(fixed)} fixed')
+
+        for name, result in totals.items():
+            self.stdout.write(self.style.SUCCESS(f'{name}: {self.format_result(result)}'))
+
+    @staticmethod
+    def simulate(jar, rows, get_interval) -> tuple:
+        """
+        Polls the history of the jar on the schedule given by `get_interval`.
+
+        Parameters:
+            - jar (Jar): The simulated jar.
+            - rows (list[tuple]): The history of the jar ordered by `date_added`.
+            - get_interval (Callable): Returns the interval until the next poll from the jar,
+              the polled rows and the poll time.
+
+        Returns:
+            tuple: The number of polls, the summed delay of the seen changes and their number.
+        """
+        dates = [row[1] for row in rows]
+        end = max(row[2] or row[1] for row in rows)
+        changes = [row[1] for row in rows if row[4]]
+
+        polls, delay, seen = 0, timedelta(), 0
+        moment = dates[0]
+        while moment <= end:
+            polls += 1
+            while seen < len(changes) and changes[seen] <= moment:
+                delay += moment - changes[seen]
+                seen += 1
+            moment += get_interval(jar, rows[:bisect_right(dates, moment)], moment)
+        return polls, delay, seen
+
+    @staticmethod
+    def adaptive_interval(jar, polled, moment) -> timedelta:
+        """Returns the interval the scheduler would choose after a poll at `moment`."""
+        incomes = sum(row[4] for row in polled if row[1] > moment - VELOCITY_WINDOW)
+        last_sum = polled[-1][3] if polled else 0
+        fill_percentage = Decimal(last_sum) * 100 / jar.goal if jar.goal else Decimal('0')
+        return calculate_poll_interval(
+            velocity=get_velocity(incomes),
+            goal=jar.goal,
+            fill_percentage=fill_percentage,
+            age=moment - jar.date_added,
+        )
+
+    @staticmethod
+    def format_result(result) -> str:
+        polls, delay, seen = result
+        average = delay / seen if seen else timedelta()
+        return f'{polls} polls, {seen} changes seen with {average} average delay'
@@ -1,4 +1,19 @@
-from django.db import models
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import connections, models, transaction
+from django.db.models import F, Max, Q, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .scheduler import VELOCITY_WINDOW, calculate_poll_interval, get_velocity
+
+
+BUCKET_FUNCTIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
 
 
 class AmountOfJarManager(models.Manager):
@@ -12,6 +27,11 @@ class AmountOfJarManager(models.Manager):
         """
         Create a new AmountOfJar instance and calculate the income difference.
 
+        The income difference is calculated against the denormalized `last_sum` of the jar,
+        so no extra query is needed to find the previous snapshot. The `last_sum`,
+        `last_incomes`, `date_last_polled` and `fill_percentage` fields of the jar are kept
+        in sync with the newly created snapshot, and `modified_at` is updated if the sum changed.
+
         Parameters:
             - jar (Jar): The Jar for which the AmountOfJar instance is created.
             - sum (int): The current sum to be set for the new AmountOfJar instance.
@@ -22,8 +42,318 @@ class AmountOfJarManager(models.Manager):
         Example:
             new_amount = AmountOfJar.objects.create_and_calculate_difference(my_jar_instance, new_sum_value)
         """
-        latest_sum = self.filter(jar=jar).latest('date_added')
-        incomes = sum - (latest_sum.sum if latest_sum else 0)
-        new_amount = self.create(jar=jar, sum=sum, incomes=incomes)
+        # A withdrawal or refund is not an income
+        incomes = max(0, sum - jar.last_sum)
+        new_amount = self.create(jar=jar, sum=sum, incomes=incomes, last_seen=timezone.now())
+        if new_amount.sum != jar.last_sum:
+            jar.modified_at = new_amount.date_added
+
+        jar.last_sum = new_amount.sum
+        jar.last_incomes = new_amount.incomes
+        jar.date_last_polled = new_amount.date_added
+        jar.fill_percentage = jar.calculate_fill_percentage()
+        type(jar).objects.filter(pk=jar.pk).update(
+            last_sum=jar.last_sum,
+            last_incomes=jar.last_incomes,
+            date_last_polled=jar.date_last_polled,
+            fill_percentage=jar.fill_percentage,
+            modified_at=jar.modified_at,
+        )
 
         return new_amount
+
+    @transaction.atomic
+    def ingest_batch(self, items, dedup=False) -> tuple[list, set]:
+        """
+        Create AmountOfJar instances for a batch of polled jars with a constant number of queries.
+
+        The incomes are calculated against the `last_sum` of the jars, which are fetched in one
+        query; a dropped balance (a withdrawal or refund) counts as no income. Snapshots are
+        written with one `bulk_create` and the jars with one `bulk_update` of the goal, closing
+        date and latest snapshot fields, so no model signals are sent. Items of closed or unknown
+        jars are skipped. The `modified_at` of the jars whose sum, goal or closing date changed
+        is updated, while polls which changed nothing keep it.
+
+        In dedup mode an unchanged sum doesn't create a snapshot: the `last_seen` of the latest
+        snapshot of the jar is moved forward instead, with one more query for the whole batch.
+
+        The next poll of every updated jar is rescheduled from its income velocity over
+        `VELOCITY_WINDOW`, which is aggregated for the whole batch in one more query.
+
+        The whole batch is written in one transaction which locks the jar rows, so batches
+        written concurrently don't calculate incomes from the same stale `last_sum`.
+
+        Items of a poll run are written once per jar and run: items of jars already written in
+        the run are skipped, and the snapshots are upserted on the unique (jar, poll_run)
+        constraint where the database supports it. The `jars_polled` checkpoint of the run is
+        advanced in the same transaction.
+
+        Parameters:
+            - items (Iterable[tuple]): Tuples of (jar_id, sum, status, goal) or (jar_id, sum, status,
+              goal, poll_run_id), where `status` is the monobank jar status and `goal` may be None
+              to keep the current goal.
+            - dedup (bool): Extend the latest snapshot instead of creating one for unchanged sums.
+
+        Returns:
+            tuple[list[AmountOfJar], set[int]]: The created AmountOfJar instances and the ids of
+            the jars whose sum, goal or closing date changed.
+
+        Example:
+            snapshots, changed = AmountOfJar.objects.ingest_batch(
+                [(1, 100000, 'ACTIVE', 500000), (2, 0, 'CLOSED', None)])
+        """
+        items = list(items)
+        jar_model = self.model._meta.get_field('jar').related_model
+        # The jars are locked until the batch is written, so concurrent writers of the same jar
+        # calculate the incomes against the `last_sum` written by the previous one
+        jars = jar_model.objects.select_for_update().filter(
+            pk__in={item[0] for item in items}, date_closed=None,
+        ).order_by('pk').only(
+            'pk', 'goal', 'date_closed', 'last_sum', 'last_incomes', 'date_last_polled',
+            'fill_percentage', 'modified_at', 'date_added', 'next_poll_at', 'poll_interval',
+        ).in_bulk()
+        written = self._get_written_in_runs(items, jars)
+
+        now = timezone.now()
+        created = {}
+        snapshots = []
+        extended = set()
+        updated = set()
+        changed = set()
+        polled_in_runs = Counter()
+        for jar_id, sum, status, goal, *run in items:
+            poll_run_id = run[0] if run else None
+            jar = jars.get(jar_id)
+            if jar is None or jar.date_closed or (jar_id, poll_run_id) in written:
+                continue
+            if poll_run_id:
+                written.add((jar_id, poll_run_id))
+                polled_in_runs[poll_run_id] += 1
+            if goal is not None and goal != jar.goal:
+                jar.goal = goal
+                jar.modified_at = now
+                changed.add(jar_id)
+            if status != 'ACTIVE':
+                jar.date_closed = now
+                jar.modified_at = now
+                changed.add(jar_id)
+            updated.add(jar)
+
+            if dedup and sum == jar.last_sum and jar.date_last_polled:
+                if jar.pk in created:
+                    created[jar.pk].last_seen = now
+                else:
+                    extended.add(jar.pk)
+            else:
+                snapshot = self.model(
+                    jar=jar, sum=sum, incomes=max(0, sum - jar.last_sum), last_seen=now, poll_run_id=poll_run_id)
+                snapshots.append(snapshot)
+                created[jar.pk] = snapshot
+                if sum != jar.last_sum:
+                    jar.modified_at = now
+                    changed.add(jar_id)
+                jar.last_sum = snapshot.sum
+                jar.last_incomes = snapshot.incomes
+            jar.date_last_polled = now
+            jar.fill_percentage = jar.calculate_fill_percentage()
+
+        if not updated:
+            return [], changed
+        self._schedule_next_polls(updated, snapshots, now)
+
+        if extended:
+            latest_ids = self.filter(jar_id__in=extended).order_by().values('jar_id').annotate(
+                latest_id=Max('id')).values_list('latest_id', flat=True)
+            self.filter(pk__in=list(latest_ids)).update(last_seen=now)
+        self._bulk_upsert(snapshots)
+        jar_model.objects.bulk_update(updated, [
+            'goal', 'date_closed', 'last_sum', 'last_incomes', 'date_last_polled',
+            'fill_percentage', 'modified_at', 'next_poll_at', 'poll_interval',
+        ])
+        poll_run_model = self.model._meta.get_field('poll_run').related_model
+        for poll_run_id, count in polled_in_runs.items():
+            poll_run_model.objects.filter(pk=poll_run_id).update(jars_polled=F('jars_polled') + count)
+
+        return snapshots, changed
+
+    def _get_written_in_runs(self, items, jars) -> set[tuple]:
+        """Returns the (jar_id, poll_run_id) pairs of the items which were already written."""
+        poll_run_ids = {item[4] for item in items if len(item) > 4 and item[4]}
+        if not poll_run_ids or not jars:
+            return set()
+        return set(
+            self.filter(poll_run_id__in=poll_run_ids, jar_id__in=jars.keys()).values_list('jar_id', 'poll_run_id')
+        )
+
+    def _bulk_upsert(self, snapshots):
+        """Creates the snapshots, updating the ones of the same jar and poll run written concurrently."""
+        features = connections[self.db].features
+        if not features.supports_update_conflicts or not any(snapshot.poll_run_id for snapshot in snapshots):
+            return self.bulk_create(snapshots)
+        options = {'update_conflicts': True, 'update_fields': ['sum', 'incomes', 'last_seen']}
+        if features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['jar', 'poll_run']
+        return self.bulk_create(snapshots, **options)
+
+    def _schedule_next_polls(self, jars, snapshots, now):
+        """Sets `poll_interval` and `next_poll_at` of the jars, including the not yet written snapshots."""
+        incomes = dict(
+            self.filter(jar_id__in=[jar.pk for jar in jars], date_added__gte=now - VELOCITY_WINDOW)
+            .order_by().values('jar_id').annotate(total=Sum('incomes')).values_list('jar_id', 'total')
+        )
+        for snapshot in snapshots:
+            incomes[snapshot.jar_id] = (incomes.get(snapshot.jar_id) or 0) + snapshot.incomes
+
+        for jar in jars:
+            interval = calculate_poll_interval(
+                velocity=get_velocity(incomes.get(jar.pk)),
+                goal=jar.goal,
+                fill_percentage=jar.fill_percentage,
+                age=now - jar.date_added,
+            )
+            jar.poll_interval = int(interval.total_seconds())
+            jar.next_poll_at = now + interval
+
+    def aggregate_by_bucket(self, jar, bucket, date_from=None, date_to=None, dense=False) -> list[dict]:
+        """
+        Aggregate the sums history of a jar into time buckets in the database.
+
+        As snapshots with an unchanged sum are merged into one row (see `last_seen`), buckets
+        without snapshots are omitted. In dense mode they are filled with the carried-forward
+        sum and 0 incomes, up to the `last_seen` of the latest snapshot.
+
+        Parameters:
+            - jar (Jar | int): The Jar (or its id) whose history is aggregated.
+            - bucket (str): The bucket size, one of `day`, `week` or `month`.
+            - date_from (datetime): Optional start of the aggregated period.
+            - date_to (datetime): Optional end of the aggregated period.
+            - dense (bool): Fill the buckets without snapshots.
+
+        Returns:
+            list[dict]: Buckets ordered by date with the last sum and the summed incomes of each.
+
+        Example:
+            points = AmountOfJar.objects.aggregate_by_bucket(jar, 'week')
+            # [{'date': datetime(...), 'sum': 100000, 'incomes': 20000}, ...]
+        """
+        queryset = self.filter(jar=jar)
+        if date_from:
+            queryset = queryset.filter(date_added__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date_added__lte=date_to)
+
+        buckets = list(
+            queryset.annotate(bucket=BUCKET_FUNCTIONS[bucket]('date_added'))
+            .values('bucket')
+            .annotate(incomes=Sum('incomes'), last_date=Max('date_added'))
+            .order_by('bucket')
+        )
+        last_sums = dict(
+            self.filter(jar=jar, date_added__in=[item['last_date'] for item in buckets])
+            .order_by()
+            .values_list('date_added', 'sum')
+        )
+
+        points = [
+            {'date': item['bucket'], 'sum': last_sums.get(item['last_date']), 'incomes': item['incomes']}
+            for item in buckets
+        ]
+        if not dense or not points:
+            return points
+
+        last_seen = queryset.order_by().aggregate(
+            last_seen=Max(Coalesce('last_seen', 'date_added')))['last_seen']
+        if date_to:
+            last_seen = min(last_seen, date_to)
+        return self._fill_buckets(points, bucket, last_seen)
+
+    @staticmethod
+    def _fill_buckets(points, bucket, end) -> list[dict]:
+        """Fills the buckets missing between the points and until `end` with the carried-forward sum."""
+        current_timezone = timezone.get_current_timezone()
+
+        def next_bucket(date):
+            day = timezone.localtime(date, current_timezone).date()
+            if bucket == 'month':
+                day = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+            else:
+                day += timedelta(days=7 if bucket == 'week' else 1)
+            return timezone.make_aware(datetime.combine(day, time()), current_timezone)
+
+        filled = [points[0]]
+        for point in points[1:] + [None]:
+            date = next_bucket(filled[-1]['date'])
+            while (date < point['date']) if point else (date <= end):
+                filled.append({'date': date, 'sum': filled[-1]['sum'], 'incomes': 0})
+                date = next_bucket(date)
+            if point:
+                filled.append(point)
+        return filled
+
+
+class JarQuerySet(models.QuerySet):
+    """
+    Custom queryset for the Jar model.
+
+    Provides read-optimized querysets for the jar endpoints, so serializing a page of jars
+    costs a fixed number of queries regardless of the page size.
+    """
+
+    LISTING_FIELDS = (
+        'id', 'monobank_id', 'title', 'description', 'volunteer', 'volunteer__public_name',
+        'title_img', 'img_alt', 'goal', 'last_sum', 'fill_percentage', 'date_added', 'date_closed',
+    )
+
+    def for_listing(self):
+        """
+        Queryset for the jar list endpoints.
+
+        Joins the volunteer, prefetches tags in one query and defers columns which are
+        not serialized. The current sum is read from the denormalized `last_sum` column.
+
+        Example:
+            jars = Jar.objects.for_listing().filter(date_closed=None)
+        """
+        return self.select_related('volunteer').prefetch_related(
+            self._tags_prefetch()
+        ).only(*self.LISTING_FIELDS)
+
+    def for_detail(self):
+        """
+        Queryset for the jar detail endpoint.
+
+        Joins the volunteer and prefetches tags and album images, each in one query.
+
+        Example:
+            jar = Jar.objects.for_detail().get(pk=pk)
+        """
+        return self.select_related('volunteer').prefetch_related(
+            self._tags_prefetch(), 'jaralbum_set'
+        )
+
+    def due_for_poll(self, now=None):
+        """
+        Queryset of the open jars whose next poll is due, the longest overdue first.
+
+        Jars which were never scheduled are due immediately.
+
+        Example:
+            jars = Jar.objects.due_for_poll()[:10]
+        """
+        now = now or timezone.now()
+        return self.filter(
+            Q(next_poll_at__lte=now) | Q(next_poll_at=None), date_closed=None
+        ).order_by(F('next_poll_at').asc(nulls_first=True), 'id')
+
+    def _tags_prefetch(self) -> models.Prefetch:
+        tag_model = self.model._meta.get_field('tags').related_model
+        tags_queryset = tag_model.objects.only('id', 'name')
+        return models.Prefetch('tags', queryset=tags_queryset)
+
+
+class JarManager(models.Manager.from_queryset(JarQuerySet)):
+    """
+    Custom manager for the Jar model.
+
+    Exposes the read-optimized methods of JarQuerySet.
+    """
@@ -0,0 +1,47 @@
+# Generated by Django 5.0 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_last_sums(apps, schema_editor):
+    Jar = apps.get_model('jars', 'Jar')
+    AmountOfJar = apps.get_model('jars', 'AmountOfJar')
+    latest = AmountOfJar.objects.filter(jar=OuterRef('pk')).order_by('-date_added', '-id')
+    jars = []
+    for jar in Jar.objects.annotate(
+        latest_sum=Subquery(latest.values('sum')[:1]),
+        latest_incomes=Subquery(latest.values('incomes')[:1]),
+        latest_date=Subquery(latest.values('date_added')[:1]),
+    ).exclude(latest_date=None).only('pk').iterator(chunk_size=500):
+        jar.last_sum = jar.latest_sum or 0
+        jar.last_incomes = jar.latest_incomes or 0
+        jar.date_last_polled = jar.latest_date
+        jars.append(jar)
+    Jar.objects.bulk_update(jars, ['last_sum', 'last_incomes', 'date_last_polled'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0012_alter_amountofjar_incomes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jar',
+            name='last_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='The sum of the latest snapshot of jar', verbose_name='last sum'),
+        ),
+        migrations.AddField(
+            model_name='jar',
+            name='last_incomes',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='The incomes of the latest snapshot of jar', verbose_name='last incomes'),
+        ),
+        migrations.AddField(
+            model_name='jar',
+            name='date_last_polled',
+            field=models.DateTimeField(blank=True, default=None, editable=False, help_text='The date and time when the latest snapshot of jar was written.', null=True, verbose_name='date last polled'),
+        ),
+        migrations.RunPython(set_last_sums, migrations.RunPython.noop),
+    ]
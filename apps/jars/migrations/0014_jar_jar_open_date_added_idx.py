@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0013_jar_last_sum_jar_last_incomes_jar_date_last_polled'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jar',
+            index=models.Index(fields=['date_closed', 'date_added', 'id'], name='jar_open_date_added_idx'),
+        ),
+    ]
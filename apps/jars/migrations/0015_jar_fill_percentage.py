@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-17 10:41
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def calculate_fill_percentage(apps, schema_editor):
+    Jar = apps.get_model('jars', 'Jar')
+    jars = []
+    for jar in Jar.objects.exclude(goal=None).exclude(goal=0).only('pk', 'goal', 'last_sum'):
+        percentage = (Decimal(jar.last_sum) * 100 / Decimal(jar.goal)).quantize(Decimal('0.01'))
+        jar.fill_percentage = min(percentage, Decimal('99999.99'))
+        jars.append(jar)
+    Jar.objects.bulk_update(jars, ['fill_percentage'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0014_jar_jar_open_date_added_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jar',
+            name='fill_percentage',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, help_text='Percentage of the goal sum reached by the last sum', max_digits=7, verbose_name='fill percentage'),
+        ),
+        migrations.AddIndex(
+            model_name='jar',
+            index=models.Index(fields=['date_closed', 'fill_percentage', 'id'], name='jar_open_fill_percentage_idx'),
+        ),
+        migrations.RunPython(calculate_fill_percentage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-17 11:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0015_jar_fill_percentage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jar',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='The date and time when jar was last modified.', verbose_name='modified at'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='jaralbum',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='The date and time when image was last modified.', verbose_name='modified at'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-17 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0016_jar_modified_at_jaralbum_modified_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='amountofjar',
+            options={'ordering': ['jar_id', '-date_added'], 'verbose_name': 'amount of jar', 'verbose_name_plural': 'Amounts Of Jars'},
+        ),
+        migrations.AddIndex(
+            model_name='amountofjar',
+            index=models.Index(fields=['jar', '-date_added', 'sum', 'incomes'], name='amount_jar_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-17 13:37
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_last_seen(apps, schema_editor):
+    AmountOfJar = apps.get_model('jars', 'AmountOfJar')
+    AmountOfJar.objects.filter(last_seen=None).update(last_seen=F('date_added'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0017_alter_amountofjar_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amountofjar',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, help_text='The date and time when the same sum was polled last.', null=True, verbose_name='last seen'),
+        ),
+        migrations.RunPython(set_last_seen, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='amountofjar',
+            name='amount_jar_latest_idx',
+        ),
+        migrations.AddIndex(
+            model_name='amountofjar',
+            index=models.Index(fields=['jar', '-date_added', 'sum', 'incomes', 'last_seen'], name='amount_jar_latest_idx'),
+        ),
+    ]
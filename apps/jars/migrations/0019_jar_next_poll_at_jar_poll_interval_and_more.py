@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-17 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0018_amountofjar_last_seen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jar',
+            name='next_poll_at',
+            field=models.DateTimeField(blank=True, default=None, editable=False, help_text='The date and time when jar is due to be polled.', null=True, verbose_name='next poll at'),
+        ),
+        migrations.AddField(
+            model_name='jar',
+            name='poll_interval',
+            field=models.PositiveIntegerField(default=86400, editable=False, help_text='Seconds between polls of jar chosen by the scheduler', verbose_name='poll interval'),
+        ),
+        migrations.AddIndex(
+            model_name='jar',
+            index=models.Index(fields=['date_closed', 'next_poll_at'], name='jar_open_next_poll_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-17 15:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0019_jar_next_poll_at_jar_poll_interval_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'running'), ('finished', 'finished')], default='running', help_text='Status of the poll run', max_length=15, verbose_name='status')),
+                ('started_at', models.DateTimeField(auto_now_add=True, help_text='The date and time when the run was started.', verbose_name='started at')),
+                ('finished_at', models.DateTimeField(blank=True, default=None, help_text='The date and time when the run was finished.', null=True, verbose_name='finished at')),
+                ('jars_total', models.PositiveIntegerField(default=0, help_text='Number of open jars when the run was started', verbose_name='jars total')),
+                ('jars_polled', models.PositiveIntegerField(default=0, help_text='Number of jars whose state was written in the run', verbose_name='jars polled')),
+            ],
+            options={
+                'verbose_name': 'poll run',
+                'verbose_name_plural': 'Poll runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='amountofjar',
+            name='poll_run',
+            field=models.ForeignKey(blank=True, editable=False, help_text='The poll run which wrote the amount', null=True, on_delete=django.db.models.deletion.SET_NULL, to='jars.pollrun', verbose_name='poll run'),
+        ),
+        migrations.AddConstraint(
+            model_name='amountofjar',
+            constraint=models.UniqueConstraint(fields=('jar', 'poll_run'), name='amount_jar_poll_run_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-17 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0020_pollrun_amountofjar_poll_run_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jar',
+            name='title_img_status',
+            field=models.CharField(choices=[('pending', 'pending'), ('ready', 'ready'), ('failed', 'failed')], default='ready', editable=False, help_text='Whether the title image is uploaded', max_length=15, verbose_name='title image status'),
+        ),
+        migrations.AddField(
+            model_name='jaralbum',
+            name='img_status',
+            field=models.CharField(choices=[('pending', 'pending'), ('ready', 'ready'), ('failed', 'failed')], default='ready', editable=False, help_text='Whether the image is uploaded', max_length=15, verbose_name='image status'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jars', '0021_jar_title_img_status_jaralbum_img_status'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='jaralbum',
+            options={'ordering': ['position', 'date_added'], 'verbose_name': 'jar album', 'verbose_name_plural': 'Albums of jars'},
+        ),
+        migrations.AddField(
+            model_name='jaralbum',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the uploaded image file', max_length=64, verbose_name='content hash'),
+        ),
+        migrations.AddField(
+            model_name='jaralbum',
+            name='position',
+            field=models.PositiveIntegerField(default=0, help_text='The position of the image in the album', verbose_name='position'),
+        ),
+    ]
@@ -1,5 +1,11 @@
-from django.core.exceptions import ObjectDoesNotExist
+from hashlib import md5
 
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from shared.cache.utils import build_versioned_key, cache_get, cache_set
 from shared.cloudinary.utils import get_full_image_url
 
 
@@ -8,11 +14,11 @@ class JarCurrentSumMixin:
     Mixin to include current sum in Jar serializers.
     """
 
-    def get_current_sum(self, instance) -> int | None:
+    def get_current_sum(self, instance) -> int:
         """
         Custom method to get the latest current sum in the jar.
 
-        Returns the latest current sum or 0 if no sums are available.
+        Reads the denormalized `last_sum` field, so no extra query is made per jar.
 
         Args:
         - instance: The Jar instance for which to retrieve the latest current sum.
@@ -20,11 +26,7 @@ class JarCurrentSumMixin:
         Returns:
         - int: The latest current sum or 0 if no sums are available.
         """
-        try:
-            latest_sum = instance.amountofjar_set.latest('date_added')
-            return latest_sum.sum
-        except ObjectDoesNotExist:
-            return 0
+        return instance.last_sum
 
 
 class JarFullTitleUrl:
@@ -43,3 +45,68 @@ class JarFullTitleUrl:
         - str | None: The full title image URL or None if the image is not available.
         """
         return get_full_image_url(obj, 'title_img')
+
+
+class CachedListMixin:
+    """
+    Mixin to cache serialized list responses under a versioned key.
+
+    The key contains the current version of `cache_namespace`, so bumping the version
+    invalidates every cached response of the namespace. A cached hit does no DB work.
+    """
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs) -> Response:
+        """
+        Returns the cached response data if available, otherwise builds and caches it.
+        """
+        key = build_versioned_key(self.cache_namespace, request.get_full_path())
+        data = cache_get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        cache_set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Mixin to answer conditional GET requests with 304 Not Modified.
+
+    Views implement `get_validators`, which computes cheap validators of the response
+    (e.g. modification dates) without serializing the body. Matching `If-None-Match` or
+    `If-Modified-Since` requests get a 304 response without the body being built.
+    """
+
+    def get_validators(self) -> tuple[list, object]:
+        """
+        Returns the parts of the ETag and the last modification date of the response.
+
+        Returns:
+        - tuple: A list of values identifying the response state and a datetime or None.
+        """
+        raise NotImplementedError('Views must implement get_validators.')
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns 304 Not Modified if the client has the current response, otherwise the response
+        with `ETag` and `Last-Modified` headers.
+        """
+        etag_parts, last_modified = self.get_validators()
+        etag = None
+        if etag_parts is not None:
+            raw = '|'.join(str(part) for part in [request.get_full_path(), *etag_parts])
+            etag = quote_etag(md5(raw.encode('utf-8'), usedforsecurity=False).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if etag:
+            response.headers['ETag'] = etag
+        if timestamp:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -1,12 +1,23 @@
+from decimal import Decimal
+
 from cloudinary.models import CloudinaryField
 from django.core.validators import MinLengthValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
-from .managers import AmountOfJarManager
+from shared.cloudinary.mixins import TrackedImagesMixin
+from shared.cloudinary.utils import IMAGE_READY, IMAGE_STATUS_CHOICES
+from .managers import AmountOfJarManager, JarManager
 from ..user.models import VolunteerInfo
 
 
+MAX_FILL_PERCENTAGE = Decimal('99999.99')
+# The largest value of PositiveIntegerField on MySQL, where it is an unsigned INT
+MAX_POSITIVE_INTEGER = 2 ** 32 - 1
+# Fields of the jar written only by the poller, with queryset updates
+POLLED_FIELDS = ('last_sum', 'last_incomes', 'date_last_polled', 'next_poll_at', 'poll_interval')
+
+
 class JarTag(models.Model):
     """
     Jar tag model
@@ -32,7 +43,7 @@ class JarTag(models.Model):
         return self.name
 
 
-class Jar(models.Model):
+class Jar(TrackedImagesMixin, models.Model):
     """
     Model for representing Jars with associated details.
 
@@ -44,10 +55,18 @@ class Jar(models.Model):
         - `tags` (ManyToManyField[JarTag]): Tags associated with the jar.
         - `goal` (PositiveIntegerField): A goal sum of the jar.
         - `title_img` (CloudinaryField): Cloudinary field for the title image of the jar.
+        - `title_img_status` (str): `pending` while the title image is uploaded, then `ready` or `failed`.
         - `img_alt` (str): Text to be loaded in case of image loss.
         - `date_added` (DateTimeField): The date and time when the jar was added to the website.
         - `date_closed` (DateTimeField): The date and time when the goal sum in the jar was reached.
         - `dd_order` (PositiveIntegerField): Default ordering field.
+        - `last_sum` (PositiveIntegerField): The sum of the latest AmountOfJar snapshot.
+        - `last_incomes` (PositiveIntegerField): The incomes of the latest AmountOfJar snapshot.
+        - `date_last_polled` (DateTimeField): The date and time when the latest snapshot was written.
+        - `fill_percentage` (DecimalField): Percentage of the goal reached by `last_sum`.
+        - `modified_at` (DateTimeField): The date and time when the jar or its sum was last modified.
+        - `next_poll_at` (DateTimeField): The date and time when the jar is due to be polled.
+        - `poll_interval` (PositiveIntegerField): Seconds between polls chosen by the scheduler.
     """
     monobank_id = models.CharField(
         max_length=31,
@@ -91,6 +110,14 @@ class Jar(models.Model):
         blank=True,
         null=True
     )
+    title_img_status = models.CharField(
+        max_length=15,
+        choices=IMAGE_STATUS_CHOICES,
+        default=IMAGE_READY,
+        editable=False,
+        verbose_name=_('title image status'),
+        help_text=_('Whether the title image is uploaded'),
+    )
     img_alt = models.CharField(
         max_length=200,
         null=True,
@@ -115,16 +142,167 @@ class Jar(models.Model):
         blank=False,
         null=False
     )
+    last_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('last sum'),
+        help_text=_('The sum of the latest snapshot of jar'),
+    )
+    last_incomes = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('last incomes'),
+        help_text=_('The incomes of the latest snapshot of jar'),
+    )
+    date_last_polled = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        editable=False,
+        verbose_name=_('date last polled'),
+        help_text=_('The date and time when the latest snapshot of jar was written.'),
+    )
+    fill_percentage = models.DecimalField(
+        max_digits=7,
+        decimal_places=2,
+        default=Decimal('0'),
+        editable=False,
+        verbose_name=_('fill percentage'),
+        help_text=_('Percentage of the goal sum reached by the last sum'),
+    )
+    modified_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('modified at'),
+        help_text=_('The date and time when jar was last modified.'),
+    )
+    next_poll_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        editable=False,
+        verbose_name=_('next poll at'),
+        help_text=_('The date and time when jar is due to be polled.'),
+    )
+    poll_interval = models.PositiveIntegerField(
+        default=86400,
+        editable=False,
+        verbose_name=_('poll interval'),
+        help_text=_('Seconds between polls of jar chosen by the scheduler'),
+    )
+
+    objects = JarManager()
+    tracked_image_fields = ('title_img',)
 
     class Meta:
         verbose_name = _('jar')
         verbose_name_plural = _('Jars')
         ordering = ['-date_added']
+        indexes = [
+            models.Index(fields=['date_closed', 'date_added', 'id'], name='jar_open_date_added_idx'),
+            models.Index(fields=['date_closed', 'fill_percentage', 'id'], name='jar_open_fill_percentage_idx'),
+            models.Index(fields=['date_closed', 'next_poll_at'], name='jar_open_next_poll_idx'),
+        ]
 
     def __str__(self) -> str:
         """class method returns the Jar in string representation"""
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the jar, without the fields written by the poller if the jar is already stored.
+
+        The jar may have been loaded before the poller wrote a snapshot batch, so its polled
+        fields are stale: they are reloaded from the locked row instead of written back, and the
+        fill percentage is calculated from the stored `last_sum`.
+        """
+        if self._state.adding or kwargs.get('update_fields') is not None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using')):
+            polled = type(self)._default_manager.select_for_update().filter(
+                pk=self.pk).values(*POLLED_FIELDS).first()
+            if polled is not None:
+                for field_name, value in polled.items():
+                    setattr(self, field_name, value)
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in POLLED_FIELDS
+                ]
+            return super().save(*args, **kwargs)
+
+    def calculate_fill_percentage(self) -> Decimal:
+        """
+        Calculates the percentage of the goal reached by the last sum.
+
+        Returns:
+            Decimal: The fill percentage rounded to 2 decimal places, or 0 if the jar has no goal.
+        """
+        if not self.goal:
+            return Decimal('0')
+        percentage = (Decimal(self.last_sum) * 100 / Decimal(self.goal)).quantize(Decimal('0.01'))
+        return min(percentage, MAX_FILL_PERCENTAGE)
+
+
+class PollRun(models.Model):
+    """
+    Model for representing a run polling every open jar.
+
+    The runs are full sweeps started manually with the `get_statistic_for_jar` task, alongside
+    the continuous polls of `schedule_polls`. The run is a checkpoint for resuming: jars polled
+    since `started_at` are not polled again when an unfinished run is resumed.
+
+    Fields:
+        - `status` (str): `running` until all jars of the run were polled, then `finished`.
+        - `started_at` (DateTimeField): The date and time when the run was started.
+        - `finished_at` (DateTimeField): The date and time when the run was finished.
+        - `jars_total` (PositiveIntegerField): Number of open jars when the run was started.
+        - `jars_polled` (PositiveIntegerField): Number of jars whose state was written in the run.
+    """
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    STATUS_CHOICES = [
+        (RUNNING, _('running')),
+        (FINISHED, _('finished')),
+    ]
+
+    status = models.CharField(
+        max_length=15,
+        choices=STATUS_CHOICES,
+        default=RUNNING,
+        verbose_name=_('status'),
+        help_text=_('Status of the poll run'),
+    )
+    started_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('started at'),
+        help_text=_('The date and time when the run was started.'),
+    )
+    finished_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        verbose_name=_('finished at'),
+        help_text=_('The date and time when the run was finished.'),
+    )
+    jars_total = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('jars total'),
+        help_text=_('Number of open jars when the run was started'),
+    )
+    jars_polled = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('jars polled'),
+        help_text=_('Number of jars whose state was written in the run'),
+    )
+
+    class Meta:
+        verbose_name = _('poll run')
+        verbose_name_plural = _('Poll runs')
+        ordering = ['-started_at']
+
+    def __str__(self) -> str:
+        """class method returns the run in string representation"""
+        return f'{self.started_at:%Y-%m-%d %H:%M} ({self.status})'
+
 
 class AmountOfJar(models.Model):
     """
@@ -133,6 +311,9 @@ class AmountOfJar(models.Model):
             sum (int): jar current sum
             jar (Jar): foreign key to jar which sum is represented
             date_added (date): date when amount was added
+            last_seen (date): date when the same sum was polled last, so one row covers
+                the period from date_added to last_seen while the sum is unchanged
+            poll_run (PollRun): the poll run which wrote the amount, if any
     """
     sum = models.PositiveIntegerField(
         verbose_name=_('sum'),
@@ -157,28 +338,53 @@ class AmountOfJar(models.Model):
         verbose_name=_('date added'),
         help_text=_('The date and time when sum was added.')
     )
+    last_seen = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('last seen'),
+        help_text=_('The date and time when the same sum was polled last.')
+    )
+    poll_run = models.ForeignKey(
+        PollRun,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_('poll run'),
+        help_text=_('The poll run which wrote the amount'),
+    )
 
     objects = AmountOfJarManager()
 
     class Meta:
         verbose_name = _('amount of jar')
         verbose_name_plural = _('Amounts Of Jars')
-        ordering = ['jar', '-date_added']
+        ordering = ['jar_id', '-date_added']
+        indexes = [
+            models.Index(fields=['jar', '-date_added', 'sum', 'incomes', 'last_seen'], name='amount_jar_latest_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['jar', 'poll_run'], name='amount_jar_poll_run_unique'),
+        ]
 
     def __str__(self) -> str:
         """class method returns the amount in string representation"""
         return f'{self.sum}'
 
 
-class JarAlbum(models.Model):
+class JarAlbum(TrackedImagesMixin, models.Model):
     """
     Model for representing albums of images associated with Jars.
 
     Fields:
     - `jar` (Jar): The Jar that the images of JarAlbum belongs to.
     - `img` (CloudinaryField): Cloudinary field for the image of the album.
+    - `img_status` (str): `pending` while the image is uploaded, then `ready` or `failed`.
     - `img_alt` (str): Text to be loaded in case of image loss.
+    - `content_hash` (str): SHA-256 of the uploaded image file, used to skip repeated uploads.
+    - `position` (int): The position of the image in the album.
     - `date_added` (DateField): The date when the image was added to the album.
+    - `modified_at` (DateTimeField): The date and time when the image was last modified.
     """
     jar = models.ForeignKey(
         Jar,
@@ -192,6 +398,14 @@ class JarAlbum(models.Model):
         blank=True,
         null=True
     )
+    img_status = models.CharField(
+        max_length=15,
+        choices=IMAGE_STATUS_CHOICES,
+        default=IMAGE_READY,
+        editable=False,
+        verbose_name=_('image status'),
+        help_text=_('Whether the image is uploaded'),
+    )
     img_alt = models.CharField(
         max_length=200,
         null=True,
@@ -199,12 +413,31 @@ class JarAlbum(models.Model):
         verbose_name=_('img_alt'),
         help_text=_('text to be loaded in case of image loss')
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name=_('content hash'),
+        help_text=_('SHA-256 of the uploaded image file'),
+    )
+    position = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('position'),
+        help_text=_('The position of the image in the album'),
+    )
     date_added = models.DateTimeField(auto_now=True, verbose_name=_('date added'))
+    modified_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('modified at'),
+        help_text=_('The date and time when image was last modified.'),
+    )
+
+    tracked_image_fields = ('img',)
 
     class Meta:
         verbose_name = _('jar album')
         verbose_name_plural = _('Albums of jars')
-        ordering = ['date_added']
+        ordering = ['position', 'date_added']
 
     def __str__(self) -> str:
         """class method returns the image URL in string representation."""
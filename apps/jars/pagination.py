@@ -0,0 +1,169 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+import json
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import ORDERING_CHOICES
+
+
+class JarKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for the jar list.
+
+    The page is keyed on the active ordering (`-date_added` by default or the value of the
+    `ordering` query parameter) with ties broken by `id`, so fetching a page costs the same
+    at any depth. The cursor is an opaque token holding the ordering value and the id of the
+    boundary jar.
+
+    Query Parameters:
+        - `cursor`: Opaque cursor returned in the `next`/`previous` links.
+        - `page_size`: Number of jars per page (up to `max_page_size`).
+
+    Response Example:
+    ```json
+    {
+        "next": "http://example.com/api/jars/?cursor=eyJ2Ij...",
+        "previous": null,
+        "results": [
+            // Jar items
+        ]
+    }
+    ```
+    """
+    page_size = 12
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    default_ordering = '-date_added'
+    invalid_cursor_message = 'Invalid cursor'
+
+    value_parsers = {
+        'date_added': parse_datetime,
+        'fill_percentage': Decimal,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None) -> list | None:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        self.field = self.ordering.lstrip('-')
+        cursor = self.decode_cursor(request)
+
+        descending = self.ordering.startswith('-')
+        reverse = bool(cursor and cursor['reverse'])
+        if reverse:
+            descending = not descending
+
+        queryset = self._order(queryset, descending)
+        if cursor:
+            queryset = self._after(queryset, cursor['value'], cursor['id'], descending)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = results
+        return self.page
+
+    def get_paginated_response(self, data) -> Response:
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema) -> dict:
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request) -> str:
+        """
+        Returns the active ordering, falling back to the default one for unknown values.
+        """
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in dict(ORDERING_CHOICES):
+            return ordering
+        return self.default_ordering
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, jar, reverse) -> str:
+        """
+        Builds the link for a cursor positioned on the given jar.
+        """
+        value = getattr(jar, self.field)
+        payload = {
+            'value': value.isoformat() if hasattr(value, 'isoformat') else str(value),
+            'id': jar.pk,
+            'reverse': reverse,
+        }
+        token = b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, request) -> dict | None:
+        """
+        Decodes the cursor query parameter.
+
+        Raises:
+            NotFound: If the cursor is malformed.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(b64decode(token.encode('ascii')).decode('utf-8'))
+            value = self.value_parsers[self.field](payload['value'])
+            if value is None:
+                raise ValueError(payload['value'])
+            return {'value': value, 'id': int(payload['id']), 'reverse': bool(payload['reverse'])}
+        except (BinasciiError, UnicodeError, KeyError, TypeError, ValueError, InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _order(self, queryset, descending) -> QuerySet:
+        prefix = '-' if descending else ''
+        return queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+
+    def _after(self, queryset, value, pk, descending) -> QuerySet:
+        lookup = 'lt' if descending else 'gt'
+        return queryset.filter(
+            Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, f'id__{lookup}': pk})
+        )
@@ -1,3 +1,8 @@
+import hashlib
+import hmac
+from time import time
+
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.permissions import BasePermission
 
@@ -28,3 +33,45 @@ class JarPermission(BasePermission):
                 return volunteer.active
             except ObjectDoesNotExist:
                 return False
+
+
+class WebhookSignaturePermission(BasePermission):
+    """
+    Permission class for the pushed jar states.
+
+    Allows requests signed with `MONOBANK_WEBHOOK_SECRET`: the `X-Signature` header must hold
+    the hex HMAC-SHA256 of `<X-Timestamp>.<raw body>`, and the timestamp must be within
+    `MONOBANK_WEBHOOK_TOLERANCE` seconds, so captured requests can't be replayed later.
+    """
+    message = 'Invalid or expired signature.'
+
+    def has_permission(self, request, view):
+        """
+        Check the signature and the timestamp of the request.
+
+        Returns False if the secret isn't configured.
+        """
+        secret = settings.MONOBANK_WEBHOOK_SECRET
+        signature = request.headers.get('X-Signature', '')
+        timestamp = request.headers.get('X-Timestamp', '')
+        if not secret or not signature or not timestamp.isdigit():
+            return False
+        if abs(time() - int(timestamp)) > settings.MONOBANK_WEBHOOK_TOLERANCE:
+            return False
+        return hmac.compare_digest(sign_webhook_body(secret, timestamp, request.body), signature)
+
+
+def sign_webhook_body(secret, timestamp, body) -> str:
+    """
+    Returns the hex HMAC-SHA256 signature of a pushed request body.
+
+    Parameters:
+        - secret (str): The shared secret.
+        - timestamp (str | int): Unix timestamp sent in the `X-Timestamp` header.
+        - body (bytes): The raw request body.
+
+    Returns:
+        str: The signature sent in the `X-Signature` header.
+    """
+    message = f'{timestamp}.'.encode('utf-8') + body
+    return hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+
+
+# Bounds of the interval between polls of one jar
+POLL_INTERVAL_MIN = timedelta(minutes=15)
+POLL_INTERVAL_MAX = timedelta(days=3)
+# Interval of jars without recent incomes
+POLL_INTERVAL_DEFAULT = timedelta(days=1)
+# The longest interval of jars added recently
+POLL_INTERVAL_NEW = timedelta(hours=1)
+# Jars younger than this are polled at least every POLL_INTERVAL_NEW
+NEW_JAR_AGE = timedelta(days=1)
+# Jars older than this without recent incomes are polled every POLL_INTERVAL_MAX
+DORMANT_JAR_AGE = timedelta(days=7)
+# Period over which the income velocity is measured
+VELOCITY_WINDOW = timedelta(days=7)
+# Expected change of sum between two polls, in percent of goal
+TARGET_CHANGE_PERCENT = Decimal('1')
+# Expected change of sum between two polls of jars without goal
+TARGET_CHANGE = 100000
+# Jars filled to this percentage are polled twice as often
+NEAR_GOAL_PERCENT = Decimal('90')
+
+
+def calculate_poll_interval(velocity, goal, fill_percentage, age) -> timedelta:
+    """
+    Calculates the interval until the next poll of a jar.
+
+    Jars are polled about as often as their sum is expected to change by TARGET_CHANGE_PERCENT
+    of the goal, based on the recent income velocity. Jars near their goal are polled twice as
+    often, new jars at least hourly and dormant jars least often.
+
+    Parameters:
+    - velocity (float): Average incomes per day over VELOCITY_WINDOW.
+    - goal (int | None): The goal sum of the jar.
+    - fill_percentage (Decimal): Percentage of the goal reached.
+    - age (timedelta): Time since the jar was added.
+
+    Returns:
+    - timedelta: The interval until the next poll.
+    """
+    if velocity > 0:
+        target = goal * TARGET_CHANGE_PERCENT / 100 if goal else TARGET_CHANGE
+        interval = timedelta(days=float(target) / velocity)
+    elif age > DORMANT_JAR_AGE:
+        interval = POLL_INTERVAL_MAX
+    else:
+        interval = POLL_INTERVAL_DEFAULT
+
+    if fill_percentage >= NEAR_GOAL_PERCENT:
+        interval /= 2
+    if age < NEW_JAR_AGE:
+        interval = min(interval, POLL_INTERVAL_NEW)
+
+    return max(POLL_INTERVAL_MIN, min(interval, POLL_INTERVAL_MAX))
+
+
+def get_velocity(incomes) -> float:
+    """
+    Returns the average incomes per day of the incomes summed over VELOCITY_WINDOW.
+
+    Parameters:
+    - incomes (int): The incomes summed over VELOCITY_WINDOW.
+
+    Returns:
+    - float: The average incomes per day.
+    """
+    return (incomes or 0) / (VELOCITY_WINDOW / timedelta(days=1))
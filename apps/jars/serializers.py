@@ -1,11 +1,15 @@
 from rest_framework import serializers
 from django.db import transaction
 
-from shared.cloudinary.utils import get_full_image_url
+from shared.cloudinary.serializers import SignedUploadField
+from shared.cloudinary.utils import assign_image, get_full_image_url
 
+from .managers import BUCKET_FUNCTIONS
 from .mixins import JarCurrentSumMixin, JarFullTitleUrl
-from .models import Jar, JarAlbum, JarTag, AmountOfJar
-from .utils import add_tag_to_jar, create_album_for_jar, formate_validate_data, get_album_img_and_img_alt_in_list
+from .models import MAX_POSITIVE_INTEGER, Jar, JarAlbum, JarTag, AmountOfJar
+from .utils import (add_uploaded_album_to_jar, create_album_for_jar, formate_validate_data,
+                    get_album_img_and_img_alt_in_list, preprocess_jar_images, set_jar_tags,
+                    update_album_of_jar)
 
 
 class JarTagSerializer(serializers.ModelSerializer):
@@ -37,6 +41,7 @@ class AmountOfJarSerializer(serializers.ModelSerializer):
         - `id` (int): The unique identifier for the AmountOfJar.
         - `sum` (int): The current sum in the jar.
         - `date_added` (datetime): Date when the amount was added.
+        - `last_seen` (datetime): Date when the same sum was polled last.
         - `incomes` (int): the income difference.
 
     Example:
@@ -45,13 +50,94 @@ class AmountOfJarSerializer(serializers.ModelSerializer):
         "id": 1,
         "sum": 100000,
         "incomes": 20000,
-        "date_added": "2023-01-01T12:00:00Z"
+        "date_added": "2023-01-01T12:00:00Z",
+        "last_seen": "2023-01-03T12:00:00Z"
     }
     ```
     """
     class Meta:
         model = AmountOfJar
-        fields = ['id', 'sum', 'incomes', 'date_added']
+        fields = ['id', 'sum', 'incomes', 'date_added', 'last_seen']
+
+
+class AmountOfJarBucketSerializer(serializers.Serializer):
+    """
+    Serializer for an aggregated bucket of the sums history of a Jar.
+
+    Fields:
+        - `date` (datetime): Start of the bucket.
+        - `sum` (int): The last sum in the jar within the bucket.
+        - `incomes` (int): The summed incomes within the bucket.
+
+    Example:
+    ```json
+    {
+        "date": "2023-01-01T00:00:00+02:00",
+        "sum": 100000,
+        "incomes": 20000
+    }
+    ```
+    """
+    date = serializers.DateTimeField()
+    sum = serializers.IntegerField(allow_null=True)
+    incomes = serializers.IntegerField()
+
+
+class StatisticQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the jar statistic.
+
+    Fields:
+        - `bucket` (str): Aggregate the history by `day`, `week` or `month`.
+        - `from` (datetime): Start of the period.
+        - `to` (datetime): End of the period.
+        - `points` (int): The maximal number of returned points.
+        - `dense` (bool): Fill the buckets without snapshots with the carried-forward sum.
+    """
+    bucket = serializers.ChoiceField(choices=list(BUCKET_FUNCTIONS), required=False)
+    points = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+    dense = serializers.BooleanField(required=False, default=False)
+
+    def get_fields(self) -> dict:
+        """Adds the period fields, which names are reserved words in Python."""
+        fields = super().get_fields()
+        fields['from'] = serializers.DateTimeField(required=False)
+        fields['to'] = serializers.DateTimeField(required=False)
+        return fields
+
+    def validate(self, attrs) -> dict:
+        if attrs.get('from') and attrs.get('to') and attrs['from'] > attrs['to']:
+            raise serializers.ValidationError({'to': 'Must be later than from.'})
+        return attrs
+
+
+class JarStatusPushSerializer(serializers.Serializer):
+    """
+    Serializer for a pushed jar state in the format of the monobank API.
+
+    Validated without database queries; the jar is resolved by the snapshot writer.
+
+    Fields:
+        - `jarId` (str): ID of the monobank jar.
+        - `jarAmount` (int): The current sum in the jar.
+        - `jarGoal` (int): The goal sum of the jar, optional.
+        - `jarStatus` (str): The monobank jar status, e.g. `ACTIVE`.
+
+    Example:
+    ```json
+    {
+        "jarId": "4Xy9wQ2bTe",
+        "jarAmount": 100000,
+        "jarGoal": 500000,
+        "jarStatus": "ACTIVE"
+    }
+    ```
+    """
+    jarId = serializers.CharField(source='monobank_id', min_length=6, max_length=31)
+    jarAmount = serializers.IntegerField(source='sum', min_value=0, max_value=MAX_POSITIVE_INTEGER)
+    jarGoal = serializers.IntegerField(
+        source='goal', min_value=0, max_value=MAX_POSITIVE_INTEGER, required=False, allow_null=True, default=None)
+    jarStatus = serializers.CharField(source='status', max_length=31)
 
 
 class JarsSerializer(serializers.ModelSerializer, JarCurrentSumMixin, JarFullTitleUrl):
@@ -113,13 +199,15 @@ class JarAlbumSerializer(serializers.ModelSerializer):
     - `id` (int): The unique identifier for the jar album.
     - `img`: A method field returning the full image URL for the jar album.
     - `img_alt` (str): The alternative text for the jar album image.
+    - `img_status` (str): `pending` while the image is uploaded, then `ready` or `failed`.
 
     Example:
     ```json
     {
         "id": 1,
         "img": "https://example.com/jar-album.jpg",
-        "img_alt": "Jar Album Image"
+        "img_alt": "Jar Album Image",
+        "img_status": "ready"
     }
     ```
     """
@@ -127,12 +215,24 @@ class JarAlbumSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = JarAlbum
-        fields = ['id', 'img', 'img_alt']
+        fields = ['id', 'img', 'img_alt', 'img_status']
 
     def get_img(self, obj) -> str | None:
         return get_full_image_url(obj, 'img')
 
 
+class AlbumUploadSerializer(serializers.Serializer):
+    """
+    Serializer for an album image uploaded directly to Cloudinary.
+
+    Fields:
+    - `img` (SignedUploadField): The upload response of the image in the `jar_album` folder.
+    - `img_alt` (str): Alternative text for the image.
+    """
+    img = SignedUploadField(folder='jar_album')
+    img_alt = serializers.CharField(max_length=200, required=False, allow_null=True)
+
+
 class JarCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating a new Jar instance.
@@ -145,6 +245,8 @@ class JarCreateSerializer(serializers.ModelSerializer):
     - `title_img` (File): Title image for the jar.
     - `img_alt` (str): Alternative text for the jar image.
     - `album` (List): List of album images for the jar.
+    - `title_img_upload` (dict): Title image uploaded directly to Cloudinary, instead of `title_img`.
+    - `album_uploads` (List): Album images uploaded directly to Cloudinary, instead of `album`.
 
     Example:
     ```json
@@ -164,11 +266,13 @@ class JarCreateSerializer(serializers.ModelSerializer):
     """
     tags = serializers.ListField(write_only=True, required=False)
     album = serializers.ListField(write_only=True, required=False)
+    title_img_upload = SignedUploadField(folder='jar_title_img', required=False)
+    album_uploads = AlbumUploadSerializer(many=True, write_only=True, required=False)
 
     class Meta:
         model = Jar
         fields = ['monobank_id', 'title', 'description', 'tags',
-                  'title_img', 'img_alt', 'album']
+                  'title_img', 'img_alt', 'album', 'title_img_upload', 'album_uploads']
 
     @transaction.atomic
     def create(self, validated_data) -> Jar:
@@ -178,17 +282,21 @@ class JarCreateSerializer(serializers.ModelSerializer):
         Returns:
             - Jar: The created Jar instance.
         """
+        title_img_upload = validated_data.pop('title_img_upload', None)
+        album_uploads = validated_data.pop('album_uploads', [])
         validated_data, tags_data, album_data, title_img_data = formate_validate_data(
             validated_data, self.context['request'])
-        jar = Jar.objects.create(**validated_data)
-        jar.title_img = title_img_data
-
-        add_tag_to_jar(jar, tags_data)
-
         album = get_album_img_and_img_alt_in_list(
             self.context['request'].FILES, album_data)
+        title_img_data, album = preprocess_jar_images(title_img_data, album)
+
+        jar = Jar.objects.create(**validated_data)
+        assign_image(jar, 'title_img', title_img_upload or title_img_data)
+
+        set_jar_tags(jar, tags_data)
 
         create_album_for_jar(jar, album)
+        add_uploaded_album_to_jar(jar, album_uploads, position=len(album))
 
         jar.save()
 
@@ -206,6 +314,10 @@ class JarUpdateSerializer(serializers.ModelSerializer):
     - `title_img` (File): Title image for the jar.
     - `img_alt` (str): Alternative text for the jar image.
     - `album` (List): List of album images for the jar.
+    - `title_img_upload` (dict): Title image uploaded directly to Cloudinary, instead of `title_img`.
+    - `album_uploads` (List): Album images uploaded directly to Cloudinary, instead of `album`.
+    - `album_keep` (List): Ids of the album images to keep, in their new order. The other images
+      are deleted and the new ones added after them. All images are kept if omitted.
 
     Example:
     ```json
@@ -215,6 +327,7 @@ class JarUpdateSerializer(serializers.ModelSerializer):
         "tags": ["category1", "category2"],
         "title_img": <file>,
         "img_alt": "New Savings Jar Image",
+        "album_keep": [3, 1],
         "album": [
             {"img": <file>, "img_alt": "Album Image 1"},
             {"img": <file>, "img_alt": "Album Image 2"}
@@ -224,11 +337,14 @@ class JarUpdateSerializer(serializers.ModelSerializer):
     """
     tags = serializers.ListField(write_only=True, required=False)
     album = serializers.ListField(write_only=True, required=False)
+    title_img_upload = SignedUploadField(folder='jar_title_img', required=False)
+    album_uploads = AlbumUploadSerializer(many=True, write_only=True, required=False)
+    album_keep = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
 
     class Meta:
         model = Jar
         fields = ['title', 'description', 'tags',
-                  'title_img', 'img_alt', 'album']
+                  'title_img', 'img_alt', 'album', 'title_img_upload', 'album_uploads', 'album_keep']
 
     @transaction.atomic
     def update(self, instance, validated_data) -> Jar:
@@ -238,21 +354,23 @@ class JarUpdateSerializer(serializers.ModelSerializer):
         Returns:
             - Jar: The updated Jar instance.
         """
+        title_img_upload = validated_data.pop('title_img_upload', None)
+        album_uploads = validated_data.pop('album_uploads', [])
+        album_keep = validated_data.pop('album_keep', None)
         validated_data, tags_data, album_data, title_img_data = formate_validate_data(
             validated_data, self.context['request'])
+        album = get_album_img_and_img_alt_in_list(
+            self.context['request'].FILES, album_data)
+        title_img_data, album = preprocess_jar_images(title_img_data, album)
 
         instance.title = validated_data['title']
         instance.description = validated_data['description']
         instance.img_alt = validated_data['img_alt']
-        instance.title_img = title_img_data
+        assign_image(instance, 'title_img', title_img_upload or title_img_data)
 
-        instance.tags.clear()
-        add_tag_to_jar(instance, tags_data)
-
-        album = get_album_img_and_img_alt_in_list(
-            self.context['request'].FILES, album_data)
+        set_jar_tags(instance, tags_data)
 
-        create_album_for_jar(instance, album)
+        update_album_of_jar(instance, album, album_uploads, album_keep)
 
         instance.save()
 
@@ -271,6 +389,7 @@ class JarSerializer(serializers.ModelSerializer, JarCurrentSumMixin, JarFullTitl
     - `tags` (List[JarTagSerializer]): List of tags associated with the jar.
     - `volunteer` (str): Public name of the volunteer associated with the jar.
     - `title_img`: A method field returning the title image of the jar.
+    - `title_img_status` (str): `pending` while the title image is uploaded, then `ready` or `failed`.
     - `img_alt` (str): The alternative text for the jar image.
     - `album` (List[JarAlbumSerializer]): List of album images associated with the jar.
     - `goal` (float): Goal sum of the jar.
@@ -290,10 +409,11 @@ class JarSerializer(serializers.ModelSerializer, JarCurrentSumMixin, JarFullTitl
         ],
         "volunteer": "JohnDoe",
         "title_img": "https://example.com/savings-jar.jpg",
+        "title_img_status": "ready",
         "img_alt": "Savings Jar Image",
         "album": [
-            {"id": 1, "img": "https://example.com/jar-album-1.jpg", "img_alt": "Album Image 1"},
-            {"id": 2, "img": "https://example.com/jar-album-2.jpg", "img_alt": "Album Image 2"}
+            {"id": 1, "img": "https://example.com/jar-album-1.jpg", "img_alt": "Album Image 1", "img_status": "ready"},
+            {"id": 2, "img": null, "img_alt": "Album Image 2", "img_status": "pending"}
         ],
         "goal": 1000,
         "current_sum": 500,
@@ -310,7 +430,7 @@ class JarSerializer(serializers.ModelSerializer, JarCurrentSumMixin, JarFullTitl
     class Meta:
         model = Jar
         fields = ['id', 'monobank_id', 'title', 'description', 'tags', 'volunteer',
-                  'title_img', 'img_alt', 'album', 'goal', 'current_sum', 'date_added']
+                  'title_img', 'title_img_status', 'img_alt', 'album', 'goal', 'current_sum', 'date_added']
 
     def get_album(self, obj) -> list:
         """
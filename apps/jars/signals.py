@@ -1,31 +1,65 @@
-from django.db.models.signals import pre_delete, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Jar, JarAlbum
+from .models import AmountOfJar, Jar, JarAlbum, JarTag
+from .utils import invalidate_jars_cache, invalidate_tags_cache
+from ..user.models import VolunteerInfo
 from shared.cloudinary.utils import image_pre_save, delete_cloudinary_image
 
 
 @receiver(pre_save, sender=Jar)
 def delete_old_title_img(sender, instance, **kwargs):
     """Deletes the old image from Cloudinary if it has changed"""
-    image_pre_save(sender, instance, field_name='title_img')
+    image_pre_save(sender, instance, field_name='title_img', update_fields=kwargs.get('update_fields'))
+
+
+@receiver(pre_save, sender=Jar)
+def update_fill_percentage(sender, instance, **kwargs):
+    """Recalculates the fill percentage, as the goal of the jar may have changed"""
+    instance.fill_percentage = instance.calculate_fill_percentage()
 
 
 @receiver(pre_delete, sender=Jar)
 def delete_title_img(sender, instance, **kwargs):
-    """Delete the image from Cloudinary before deleting the Jar"""
-    old_instance = sender.objects.get(pk=instance.pk)
-    delete_cloudinary_image(old_instance, field_name='title_img')
+    """Requests deleting the image from Cloudinary with the Jar"""
+    delete_cloudinary_image(instance, field_name='title_img')
 
 
 @receiver(pre_save, sender=JarAlbum)
 def delete_old_img(sender, instance, **kwargs):
     """Deletes the old image from Cloudinary if it has changed"""
-    image_pre_save(sender, instance, field_name='img')
+    image_pre_save(sender, instance, field_name='img', update_fields=kwargs.get('update_fields'))
 
 
 @receiver(pre_delete, sender=JarAlbum)
 def delete_img(sender, instance, **kwargs):
-    """Delete the image from Cloudinary before deleting the JarAlbum"""
-    old_instance = sender.objects.get(pk=instance.pk)
-    delete_cloudinary_image(old_instance, field_name='img')
+    """Requests deleting the image from Cloudinary with the JarAlbum"""
+    delete_cloudinary_image(instance, field_name='img')
+
+
+@receiver([post_save, post_delete], sender=Jar)
+@receiver([post_save, post_delete], sender=AmountOfJar)
+@receiver(post_save, sender=VolunteerInfo)
+@receiver(m2m_changed, sender=Jar.tags.through)
+def invalidate_cached_jars(sender, **kwargs):
+    """Invalidates cached jar responses when a jar, its sum, volunteer or tags change"""
+    invalidate_jars_cache()
+
+
+@receiver(post_save, sender=VolunteerInfo)
+def touch_volunteer_jars(sender, instance, **kwargs):
+    """Updates the modification date of the volunteer's jars, as they show the public name"""
+    Jar.objects.filter(volunteer=instance).update(modified_at=timezone.now())
+
+
+@receiver([post_save, pre_delete], sender=JarTag)
+def touch_tagged_jars(sender, instance, **kwargs):
+    """Updates the modification date of the jars with the tag, as they show its name"""
+    Jar.objects.filter(tags=instance).update(modified_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=JarTag)
+def invalidate_cached_tags(sender, **kwargs):
+    """Invalidates cached tag and jar responses when a tag changes"""
+    invalidate_tags_cache()
@@ -1,40 +1,385 @@
+import hashlib
 import json
 import requests
-from os import getenv
-from time import sleep
-from celery import shared_task
-from datetime import datetime
+from datetime import timedelta
+from time import time
+from uuid import uuid4
+from celery import chord, shared_task
+from celery.signals import worker_ready
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from .models import AmountOfJar, Jar
+from shared.redis.utils import RedisLock, TokenBucket, get_redis_connection
+from .models import AmountOfJar, Jar, PollRun
+from .utils import invalidate_jars_cache
 
 
-url = getenv('API_JAR')
-body = json.loads(getenv('JAR_POST_BODY'))
+logger = get_task_logger(__name__)
 
-if not url or not body:
-    raise ValueError(
-        "API_JAR and JAR_POST_BODY environment variables must be set.")
+SNAPSHOT_QUEUE_KEY = 'jars:snapshot_queue'
+SNAPSHOT_DEAD_LETTER_KEY = 'jars:snapshot_dead_letter'
+SNAPSHOT_FAILURES_KEY = 'jars:snapshot_failures:{}'
+# Seconds for which the failed writes of a batch are counted
+SNAPSHOT_FAILURES_TIMEOUT = 24 * 60 * 60
 
+_session = None
 
-def get_jar_data(monobank_id):
+
+class JarDataUnavailable(Exception):
+    """Raised when the jar data can't be fetched, e.g. because of a timeout or an API error."""
+
+
+def create_session() -> requests.Session:
+    """
+    Creates an HTTP session with a keep-alive connection pool and retries.
+
+    Requests failed with 429 or 5xx are retried with bounded exponential backoff,
+    honouring the Retry-After header.
+    """
+    retry = Retry(
+        total=settings.MONOBANK_RETRIES,
+        backoff_factor=settings.MONOBANK_BACKOFF_FACTOR,
+        backoff_max=settings.MONOBANK_BACKOFF_MAX,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'POST'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=settings.MONOBANK_POOL_SIZE, max_retries=retry)
+    http_session = requests.Session()
+    http_session.mount('https://', adapter)
+    http_session.mount('http://', adapter)
+    return http_session
+
+
+def get_session() -> requests.Session:
+    """Returns the HTTP session shared by the process, created on first use."""
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+
+def get_jar_api_config() -> tuple[str, dict]:
+    """
+    Returns the URL of the monobank jar API and the body of its requests.
+
+    Raises:
+        ImproperlyConfigured: If `MONOBANK_API_JAR` or `MONOBANK_JAR_POST_BODY` isn't set.
+    """
+    url = settings.MONOBANK_API_JAR
+    body = json.loads(settings.MONOBANK_JAR_POST_BODY or '{}')
+    if not url or not body:
+        raise ImproperlyConfigured('API_JAR and JAR_POST_BODY environment variables must be set.')
+    return url, body
+
+
+def get_jar_data(monobank_id, session=None) -> dict:
+    """
+    Fetches the current state of the jar from the monobank API.
+
+    Parameters:
+        - monobank_id (str): ID of the monobank jar.
+        - session (requests.Session): Optional session used instead of the shared one.
+
+    Returns:
+        dict: The jar data, e.g. `jarAmount`, `jarGoal` and `jarStatus`.
+
+    Raises:
+        JarDataUnavailable: If the data can't be fetched after the retries.
+    """
+    url, body = get_jar_api_config()
     try:
-        body['clientId'] = monobank_id
-        response = requests.post(url, json=body)
+        response = (session or get_session()).post(
+            url,
+            json={**body, 'clientId': monobank_id},
+            timeout=(settings.MONOBANK_CONNECT_TIMEOUT, settings.MONOBANK_READ_TIMEOUT),
+        )
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching data for jar {monobank_id}: {e}")
-        return {}
+    except (requests.RequestException, ValueError) as e:
+        raise JarDataUnavailable(f'Error fetching data for jar {monobank_id}: {e}') from e
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Returns the rate limiter of the monobank API shared by all workers."""
+    return TokenBucket('monobank', rate=settings.MONOBANK_RATE_LIMIT, capacity=settings.MONOBANK_RATE_BURST)
+
+
+def get_poll_run_lock() -> RedisLock:
+    """Returns the lock held by the active poll run."""
+    return RedisLock('jars:poll_run', timeout=settings.POLL_RUN_LOCK_TIMEOUT)
+
+
+def enqueue_snapshots(items) -> None:
+    """
+    Pushes polled jar states to the queue of the batch snapshot writer.
+
+    Starts `write_snapshots` as soon as a full batch is queued; the rest is written by the
+    periodic run of `write_snapshots`.
+
+    Parameters:
+        - items (list[tuple | dict]): Tuples of (jar_id, sum, status, goal, poll_run_id), or dicts with the
+          `monobank_id`, `sum`, `status` and `goal` of pushed jar states, which are resolved
+          to jars by the writer.
+    """
+    if not items:
+        return
+    length = get_redis_connection().rpush(SNAPSHOT_QUEUE_KEY, *[json.dumps(item) for item in items])
+    if length >= settings.SNAPSHOT_BATCH_SIZE:
+        write_snapshots.delay()
+
+
+def resolve_pushed_items(items) -> list[tuple]:
+    """
+    Converts the pushed jar states of a batch to (jar_id, sum, status, goal) tuples.
+
+    The monobank ids are resolved to jars in one query; states of unknown jars are dropped.
+
+    Parameters:
+        - items (list[list | dict]): Decoded queue items.
+
+    Returns:
+        list[tuple]: Items accepted by `AmountOfJar.objects.ingest_batch`.
+    """
+    monobank_ids = {item['monobank_id'] for item in items if isinstance(item, dict)}
+    jar_ids = dict(Jar.objects.filter(monobank_id__in=monobank_ids).values_list('monobank_id', 'pk')) \
+        if monobank_ids else {}
+
+    resolved = []
+    for item in items:
+        if not isinstance(item, dict):
+            resolved.append(tuple(item))
+        elif item['monobank_id'] in jar_ids:
+            resolved.append((jar_ids[item['monobank_id']], item['sum'], item['status'], item['goal']))
+    return resolved
+
+
+def ingest_queued_items(items) -> tuple[list, set]:
+    """
+    Writes queued jar states with `AmountOfJar.objects.ingest_batch`.
+
+    Parameters:
+        - items (list[bytes]): The JSON encoded jar states.
+
+    Returns:
+        tuple[list[AmountOfJar], set[int]]: The created snapshots and the ids of the changed jars.
+    """
+    return AmountOfJar.objects.ingest_batch(
+        resolve_pushed_items([json.loads(item) for item in items]), dedup=settings.SNAPSHOT_DEDUP)
+
+
+def count_batch_failure(connection, items) -> int:
+    """
+    Counts a failed write of a batch of queued jar states, identified by their content.
+
+    Returns:
+        int: The number of failed writes of the batch in the last `SNAPSHOT_FAILURES_TIMEOUT`.
+    """
+    key = SNAPSHOT_FAILURES_KEY.format(hashlib.sha256(b'\n'.join(items)).hexdigest())
+    pipeline = connection.pipeline()
+    pipeline.incr(key)
+    pipeline.expire(key, SNAPSHOT_FAILURES_TIMEOUT)
+    failures, _ = pipeline.execute()
+    return failures
+
+
+def ingest_items_one_by_one(connection, items) -> tuple[list, set]:
+    """
+    Writes the queued jar states of a failing batch one by one, moving the states which can't
+    be written to the dead-letter list.
+
+    Returns:
+        tuple[list[AmountOfJar], set[int]]: The created snapshots and the ids of the changed jars.
+    """
+    snapshots, changed = [], set()
+    for item in items:
+        try:
+            item_snapshots, item_changed = ingest_queued_items([item])
+        except Exception:
+            logger.exception(f'Moved the jar state {item!r} to the dead-letter list')
+            connection.rpush(SNAPSHOT_DEAD_LETTER_KEY, item)
+            continue
+        snapshots += item_snapshots
+        changed |= item_changed
+    return snapshots, changed
+
+
+@shared_task()
+def write_snapshots():
+    """
+    Writes the queued jar states in batches with `AmountOfJar.objects.ingest_batch`.
+
+    If a batch can't be written, its states are put back at the head of the queue in their
+    order and the error is raised, so they are written by the next run. A batch which failed
+    `SNAPSHOT_MAX_FAILURES` times is written one state at a time instead, and the states which
+    still fail are moved to the dead-letter list, so they don't block the queue.
+
+    The cached jar responses are invalidated once, and only if a sum, goal or closing date
+    changed.
+
+    Returns:
+        int: The number of written snapshots.
+    """
+    connection = get_redis_connection()
+    written = 0
+    changed = False
+    try:
+        while True:
+            pipeline = connection.pipeline()
+            pipeline.lrange(SNAPSHOT_QUEUE_KEY, 0, settings.SNAPSHOT_BATCH_SIZE - 1)
+            pipeline.ltrim(SNAPSHOT_QUEUE_KEY, settings.SNAPSHOT_BATCH_SIZE, -1)
+            items, _ = pipeline.execute()
+            if not items:
+                break
+            try:
+                snapshots, changed_jars = ingest_queued_items(items)
+            except Exception:
+                if count_batch_failure(connection, items) < settings.SNAPSHOT_MAX_FAILURES:
+                    connection.lpush(SNAPSHOT_QUEUE_KEY, *reversed(items))
+                    raise
+                logger.exception(f'Writing a batch of {len(items)} jar states failed repeatedly')
+                snapshots, changed_jars = ingest_items_one_by_one(connection, items)
+            written += len(snapshots)
+            changed = changed or bool(changed_jars)
+    finally:
+        if changed:
+            invalidate_jars_cache()
+    return written
 
 
 @shared_task()
 def get_statistic_for_jar():
+    """
+    Polls every open jar in a poll run.
+
+    Fans the jars out as `poll_jar` subtasks, which run as fast as the shared rate limit
+    allows, and finishes the run with `report_poll_run` when all of them are finished.
+
+    Only one run is active at a time, guarded by the poll run lock, which the subtasks keep
+    extending. An unfinished run, e.g. of workers which died, is resumed once its lock expired:
+    the jars polled since the run started are not polled again.
+
+    The runs are not scheduled, as `schedule_polls` polls the jars continuously: a run is a full
+    sweep started manually, e.g. with `get_statistic_for_jar.delay()`.
+    """
+    token = uuid4().hex
+    if not get_poll_run_lock().acquire(token):
+        logger.info('Skipped the poll run, another one is in progress')
+        return
+
     jars = Jar.objects.filter(date_closed=None)
-    for jar in jars:
-        jar_data = get_jar_data(jar.monobank_id)
-        jar.goal = jar_data.get('jarGoal', jar.goal)
-        if jar_data.get('jarStatus') != 'ACTIVE':
-            jar.date_closed = datetime.now()
-        AmountOfJar.objects.create_and_calculate_difference(jar=jar, sum=jar_data.get('jarAmount', 0))
-        jar.save()
-        sleep(61)
+    poll_run = PollRun.objects.filter(status=PollRun.RUNNING).first()
+    if poll_run:
+        jars = jars.exclude(date_last_polled__gte=poll_run.started_at)
+        logger.info(f'Resuming the poll run {poll_run.pk} with {poll_run.jars_polled} jars polled')
+    else:
+        poll_run = PollRun.objects.create(jars_total=jars.count())
+
+    jars = list(jars.values_list('pk', 'monobank_id'))
+    callback = report_poll_run.s(poll_run.pk, time(), token)
+    if not jars:
+        callback.delay([])
+        return
+    chord(
+        poll_jar.s(jar_id, monobank_id, poll_run_id=poll_run.pk, lock_token=token) for jar_id, monobank_id in jars
+    )(callback)
+
+
+@worker_ready.connect
+def resume_poll_run(**kwargs):
+    """
+    Resumes an unfinished poll run when a worker starts, after the lock of the run expired.
+    """
+    if PollRun.objects.filter(status=PollRun.RUNNING).exists():
+        get_statistic_for_jar.apply_async(countdown=get_poll_run_lock().ttl())
+
+
+@shared_task()
+def schedule_polls():
+    """
+    Dispatches `poll_jar` for the jars whose next poll is due, the longest overdue first.
+
+    Runs every `POLL_SCHEDULER_INTERVAL` seconds and dispatches no more jars than the rate
+    limit allows in that time. The dispatched jars are leased for `POLL_SCHEDULER_LEASE`
+    seconds, so they aren't dispatched again until polled; the snapshot writer then sets
+    their next poll time from the income velocity.
+
+    No jars are dispatched while a poll run is in progress, as it polls every open jar. An
+    unfinished poll run whose lock expired is resumed instead.
+
+    Returns:
+        int: The number of dispatched jars.
+    """
+    if get_poll_run_lock().ttl():
+        return 0
+    if PollRun.objects.filter(status=PollRun.RUNNING).exists():
+        get_statistic_for_jar.delay()
+        return 0
+
+    budget = max(1, int(settings.MONOBANK_RATE_LIMIT * settings.POLL_SCHEDULER_INTERVAL))
+    now = timezone.now()
+    jars = list(Jar.objects.due_for_poll(now).values_list('pk', 'monobank_id')[:budget])
+    if not jars:
+        return 0
+
+    Jar.objects.filter(pk__in=[jar_id for jar_id, _ in jars]).update(
+        next_poll_at=now + timedelta(seconds=settings.POLL_SCHEDULER_LEASE))
+    for jar_id, monobank_id in jars:
+        poll_jar.delay(jar_id, monobank_id)
+    return len(jars)
+
+
+@shared_task(bind=True, max_retries=None)
+def poll_jar(self, jar_id, monobank_id, reserved=False, poll_run_id=None, lock_token=None):
+    """
+    Fetches the current state of the jar and queues it for the batch snapshot writer.
+
+    Waits for the shared rate limiter by retrying with a countdown, so no worker sleeps.
+    If the jar data is unavailable, nothing is queued and the jar stays open. Polls of a
+    poll run extend the lock of the run.
+
+    Returns:
+        bool: True if the jar was polled.
+    """
+    if not reserved:
+        wait = get_rate_limiter().reserve(max_wait=settings.MONOBANK_MAX_WAIT)
+        if wait is None or wait > 0:
+            countdown = settings.MONOBANK_MAX_WAIT if wait is None else wait
+            raise self.retry(countdown=countdown, args=(jar_id, monobank_id), kwargs={
+                'reserved': wait is not None, 'poll_run_id': poll_run_id, 'lock_token': lock_token,
+            })
+
+    try:
+        jar_data = get_jar_data(monobank_id)
+    except JarDataUnavailable as e:
+        logger.warning(e)
+        return False
+    finally:
+        if lock_token:
+            get_poll_run_lock().extend(lock_token)
+
+    enqueue_snapshots([(
+        jar_id, jar_data.get('jarAmount', 0), jar_data.get('jarStatus'), jar_data.get('jarGoal'), poll_run_id,
+    )])
+    return True
+
+
+@shared_task()
+def report_poll_run(results, poll_run_id, started_at, lock_token):
+    """
+    Writes the remaining queued snapshots, finishes the poll run, releases its lock and
+    reports the runtime and the requests per second of the run (since it was resumed).
+    """
+    write_snapshots()
+    PollRun.objects.filter(pk=poll_run_id).update(status=PollRun.FINISHED, finished_at=timezone.now())
+    get_poll_run_lock().release(lock_token)
+    runtime = time() - started_at
+    polled = sum(1 for result in results if result)
+    requests_per_second = polled / runtime if runtime else 0
+    logger.info(f'Polled {polled} of {len(results)} jars in {runtime:.1f}s ({requests_per_second:.3f} requests/s)')
+    return {'polled': polled, 'jars': len(results), 'runtime': runtime, 'requests_per_second': requests_per_second}
@@ -0,0 +1,96 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.user.models import User, VolunteerInfo
+from .models import AmountOfJar, Jar, JarTag, PollRun
+
+
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'fallback': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class JarListQueryCountTest(TestCase):
+    """The jar list is served with a fixed number of queries, whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('volunteer@example.com', 'password')
+        volunteer = VolunteerInfo.objects.create(
+            user=user, public_name='volunteer', first_name='first', last_name='last', active=True)
+        tags = [JarTag.objects.create(name=f'tag{number}') for number in range(3)]
+        for number in range(30):
+            jar = Jar.objects.create(
+                monobank_id=f'monobank{number:04d}', title=f'Jar {number}', description='description' * 6,
+                volunteer=volunteer, goal=100000)
+            jar.tags.set(tags[:number % 3 + 1])
+            AmountOfJar.objects.create_and_calculate_difference(jar, number * 100)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        """Validators, the page of jars with their volunteers and the prefetched tags."""
+        for page_size in (5, 25):
+            with self.subTest(page_size=page_size), self.assertNumQueries(3):
+                response = self.client.get(reverse('jars_list'), {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class IngestBatchTest(TestCase):
+    """Snapshot batches written by `AmountOfJar.objects.ingest_batch`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('volunteer@example.com', 'password')
+        volunteer = VolunteerInfo.objects.create(
+            user=user, public_name='volunteer', first_name='first', last_name='last', active=True)
+        cls.jar = Jar.objects.create(
+            monobank_id='monobank0001', title='Jar 1', description='description' * 6,
+            volunteer=volunteer, goal=100000)
+        AmountOfJar.objects.create_and_calculate_difference(cls.jar, 50000)
+
+    def test_dropped_balance_counts_as_no_income(self):
+        snapshots, changed = AmountOfJar.objects.ingest_batch([(self.jar.pk, 20000, 'ACTIVE', None)])
+
+        self.assertEqual([(snapshot.sum, snapshot.incomes) for snapshot in snapshots], [(20000, 0)])
+        self.assertEqual(changed, {self.jar.pk})
+        self.jar.refresh_from_db()
+        self.assertEqual((self.jar.last_sum, self.jar.last_incomes), (20000, 0))
+        self.assertEqual(self.jar.fill_percentage, 20)
+
+    def test_dedup_extends_latest_snapshot(self):
+        latest = AmountOfJar.objects.get(jar=self.jar)
+        modified_at = Jar.objects.get(pk=self.jar.pk).modified_at
+
+        snapshots, changed = AmountOfJar.objects.ingest_batch([(self.jar.pk, 50000, 'ACTIVE', None)], dedup=True)
+
+        self.assertEqual((snapshots, changed), ([], set()))
+        self.assertEqual(AmountOfJar.objects.filter(jar=self.jar).count(), 1)
+        self.assertGreater(AmountOfJar.objects.get(pk=latest.pk).last_seen, latest.last_seen)
+        self.assertEqual(Jar.objects.get(pk=self.jar.pk).modified_at, modified_at)
+
+    def test_item_of_poll_run_is_written_once(self):
+        poll_run = PollRun.objects.create(jars_total=1)
+        item = (self.jar.pk, 60000, 'ACTIVE', None, poll_run.pk)
+
+        snapshots, _ = AmountOfJar.objects.ingest_batch([item, item])
+        repeated, changed = AmountOfJar.objects.ingest_batch([item])
+
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual((repeated, changed), ([], set()))
+        self.assertEqual(AmountOfJar.objects.filter(jar=self.jar, poll_run=poll_run).count(), 1)
+        self.assertEqual(AmountOfJar.objects.get(jar=self.jar, poll_run=poll_run).incomes, 10000)
+        poll_run.refresh_from_db()
+        self.assertEqual(poll_run.jars_polled, 1)
+
+    def test_closed_jar_is_skipped_afterwards(self):
+        _, changed = AmountOfJar.objects.ingest_batch([(self.jar.pk, 70000, 'CLOSED', None)])
+        snapshots, _ = AmountOfJar.objects.ingest_batch([(self.jar.pk, 80000, 'ACTIVE', None)])
+
+        self.assertEqual(changed, {self.jar.pk})
+        self.assertEqual(snapshots, [])
+        self.jar.refresh_from_db()
+        self.assertIsNotNone(self.jar.date_closed)
+        self.assertEqual(self.jar.last_sum, 70000)
@@ -11,4 +11,5 @@ urlpatterns = [
     ])),
     path('banner/', views.JarsListForBannerView.as_view(), name='banner'),
     path('tags/', views.TagsListView.as_view(), name='tags_list'),
+    path('ingest/', views.JarStatusPushView.as_view(), name='jar_status_push'),
 ]
@@ -1,12 +1,71 @@
+from math import ceil
+
 from apps.jars.models import JarAlbum, JarTag
-from django.core.exceptions import ObjectDoesNotExist
+from django.conf import settings
+from django.utils import timezone
 
 from apps.user.models import VolunteerInfo
+from shared.cache.utils import build_versioned_key, bump_cache_version, cache_get, cache_set
+from shared.cloudinary.utils import acquire_uploaded_images, assign_image, get_content_hash, upload_images
+from shared.images.utils import preprocess_images
+
+
+JARS_CACHE_NAMESPACE = 'jars'
+TAGS_CACHE_NAMESPACE = 'jar_tags'
+
+
+def invalidate_jars_cache() -> None:
+    """
+    Invalidates cached responses which contain jars.
+
+    Returns:
+    - None
+    """
+    bump_cache_version(JARS_CACHE_NAMESPACE)
 
 
-def add_tag_to_jar(jar, tags_data) -> None:
+def invalidate_tags_cache() -> None:
     """
-    Adds tags to a Jar instance.
+    Invalidates cached responses which contain tags, including the jar ones.
+
+    Returns:
+    - None
+    """
+    bump_cache_version(TAGS_CACHE_NAMESPACE)
+    bump_cache_version(JARS_CACHE_NAMESPACE)
+
+
+def get_tag_ids(names) -> dict:
+    """
+    Resolves tag names to ids.
+
+    The names are looked up in a cached map of tag names to ids, which is invalidated with
+    the tag responses. Names missing from the map are resolved with one query and added to it.
+
+    Parameters:
+    - names (list): List of tag names.
+
+    Returns:
+    - dict: The ids of the existing tags by their names.
+    """
+    key = build_versioned_key(TAGS_CACHE_NAMESPACE, 'tag_ids')
+    tag_ids = cache_get(key) or {}
+    missing = set(names) - tag_ids.keys()
+    if missing:
+        found = dict(JarTag.objects.filter(name__in=missing).values_list('name', 'id'))
+        if found:
+            tag_ids.update(found)
+            cache_set(key, tag_ids, settings.TAG_IDS_CACHE_TIMEOUT)
+    return {name: tag_ids[name] for name in names if name in tag_ids}
+
+
+def set_jar_tags(jar, tags_data) -> None:
+    """
+    Sets the tags of a Jar instance, ignoring unknown tag names.
+
+    Only the added and removed tags are written, each with one query. The writes go to
+    the through table directly and send no m2m_changed signals, so the jar cache is
+    invalidated here.
 
     Parameters:
     - jar: The Jar instance.
@@ -15,32 +74,133 @@ def add_tag_to_jar(jar, tags_data) -> None:
     Returns:
     - None
     """
-    for tag_data in tags_data:
-        try:
-            tag = JarTag.objects.get(name=tag_data)
-        except ObjectDoesNotExist:
-            pass
-        else:
-            jar.tags.add(tag)
+    through = jar.tags.through
+    tag_ids = set(get_tag_ids(tags_data).values())
+    current_ids = set(through.objects.filter(jar=jar).values_list('jartag_id', flat=True))
+
+    removed_ids = current_ids - tag_ids
+    if removed_ids:
+        through.objects.filter(jar=jar, jartag_id__in=removed_ids).delete()
+    added_ids = tag_ids - current_ids
+    if added_ids:
+        through.objects.bulk_create([through(jar=jar, jartag_id=tag_id) for tag_id in added_ids])
 
+    if removed_ids or added_ids:
+        invalidate_jars_cache()
 
-def create_album_for_jar(jar, album) -> None:
+
+def create_album_for_jar(jar, album, position=0) -> None:
     """
     Creates album images for a Jar instance.
 
+    The images are uploaded concurrently and the rows are created with one query, or with
+    `IMAGE_UPLOAD_ASYNC` each row is created pending and its image uploaded in the background.
+
     Parameters:
     - jar: The Jar instance.
     - album (list): List of dictionaries containing album image data.
+    - position (int): The position of the first image in the album.
 
     Returns:
     - None
     """
-    for image in album:
-        img = image['img']
-        img_alt = image['img_alt']
-        img_album = JarAlbum.objects.create(jar=jar, img_alt=img_alt)
+    if not album:
+        return
+
+    img_albums = [
+        JarAlbum(
+            jar=jar,
+            img_alt=image['img_alt'],
+            content_hash=image.get('content_hash') or get_content_hash(image['img']),
+            position=position + index,
+        )
+        for index, image in enumerate(album)
+    ]
+    if settings.IMAGE_UPLOAD_ASYNC:
+        for img_album, image in zip(img_albums, album):
+            assign_image(img_album, 'img', image['img'])
+            img_album.save()
+        return
+
+    for img_album, img in zip(img_albums, upload_images(img_albums, 'img', [image['img'] for image in album])):
         img_album.img = img
-        img_album.save()
+    JarAlbum.objects.bulk_create(img_albums)
+
+
+def add_uploaded_album_to_jar(jar, album_uploads, position=0) -> None:
+    """
+    Creates album images for a Jar instance from images uploaded directly to Cloudinary.
+
+    Parameters:
+    - jar: The Jar instance.
+    - album_uploads (list): List of dictionaries with the uploaded `img` and its `img_alt`.
+    - position (int): The position of the first image in the album.
+
+    Returns:
+    - None
+    """
+    acquire_uploaded_images([image['img'] for image in album_uploads])
+    JarAlbum.objects.bulk_create([
+        JarAlbum(jar=jar, img=image['img'], img_alt=image.get('img_alt'), position=position + index)
+        for index, image in enumerate(album_uploads)
+    ])
+
+
+def update_album_of_jar(jar, album, album_uploads, album_keep=None) -> None:
+    """
+    Updates the album of a Jar instance with only the changed images.
+
+    The kept images are reordered as listed in `album_keep` and the others are deleted, then
+    the new images are added after them. A new image with the same content as an image of the
+    album is not uploaded again: the existing image is kept in its place instead. Deletions,
+    reorders and inserts are each written in bulk.
+
+    Parameters:
+    - jar: The Jar instance.
+    - album (list): List of dictionaries containing new album image data.
+    - album_uploads (list): List of dictionaries with images uploaded directly to Cloudinary.
+    - album_keep (list | None): Ids of the album images to keep, in their new order.
+      All images are kept in their order by default.
+
+    Returns:
+    - None
+    """
+    existing = list(JarAlbum.objects.filter(jar=jar).only('id', 'content_hash', 'position'))
+    if album_keep is None:
+        kept = existing
+    else:
+        images_by_id = {img_album.pk: img_album for img_album in existing}
+        kept = [images_by_id[pk] for pk in dict.fromkeys(album_keep) if pk in images_by_id]
+
+    images_by_hash = {img_album.content_hash: img_album for img_album in existing if img_album.content_hash}
+    new_album = []
+    new_hashes = set()
+    for image in album:
+        content_hash = get_content_hash(image['img'])
+        duplicate = images_by_hash.get(content_hash)
+        if duplicate is not None:
+            if duplicate not in kept:
+                kept.append(duplicate)
+        elif content_hash not in new_hashes:
+            new_hashes.add(content_hash)
+            new_album.append({**image, 'content_hash': content_hash})
+
+    removed_ids = {img_album.pk for img_album in existing} - {img_album.pk for img_album in kept}
+    if removed_ids:
+        JarAlbum.objects.filter(pk__in=removed_ids).delete()
+
+    now = timezone.now()
+    moved = []
+    for position, img_album in enumerate(kept):
+        if img_album.position != position:
+            img_album.position = position
+            img_album.modified_at = now
+            moved.append(img_album)
+    if moved:
+        JarAlbum.objects.bulk_update(moved, ['position', 'modified_at'])
+
+    create_album_for_jar(jar, new_album, position=len(kept))
+    add_uploaded_album_to_jar(jar, album_uploads, position=len(kept) + len(new_album))
 
 
 def formate_validate_data(validated_data, request) -> list:
@@ -94,3 +254,48 @@ def get_album_img_and_img_alt_in_list(files, album_data) -> list:
                 img_alt = None
             album.append({'img': files[key], 'img_alt': img_alt})
     return album
+
+
+def preprocess_jar_images(title_img_data, album) -> list:
+    """
+    Preprocesses the uploaded title image and album images of a jar together.
+
+    Parameters:
+    - title_img_data (UploadedFile | None): The uploaded title image.
+    - album (list): List of dictionaries containing album image data.
+
+    Returns:
+    - list: List containing the preprocessed title image and album.
+    """
+    title_img_data, *album_images = preprocess_images([title_img_data] + [image['img'] for image in album])
+    album = [{**image, 'img': img} for image, img in zip(album, album_images)]
+    return [title_img_data, album]
+
+
+def downsample_statistic(points, max_points) -> list:
+    """
+    Downsamples a series of statistic points to at most `max_points` points.
+
+    Consecutive points are merged into groups: each group keeps the date of its first point,
+    the sum of its last point and the summed incomes of all its points.
+
+    Parameters:
+    - points (list): List of dictionaries with `date`, `sum` and `incomes` keys, ordered by date.
+    - max_points (int): The maximal number of points to return.
+
+    Returns:
+    - list: List of merged points.
+    """
+    if len(points) <= max_points:
+        return points
+
+    size = ceil(len(points) / max_points)
+    merged = []
+    for start in range(0, len(points), size):
+        group = points[start:start + size]
+        merged.append({
+            'date': group[0]['date'],
+            'sum': group[-1]['sum'],
+            'incomes': sum(point['incomes'] or 0 for point in group),
+        })
+    return merged
@@ -1,33 +1,54 @@
 from typing import Type
 
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db.models import Count, Max, QuerySet
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, generics
+from rest_framework import filters, generics, status
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 
 from .filters import JarFilter
+from .mixins import CachedListMixin, ConditionalGetMixin
 from .models import AmountOfJar, Jar, JarTag
-from .permissions import JarPermission
-from .serializers import AmountOfJarSerializer, JarSerializer, JarTagSerializer, JarUpdateSerializer, JarsSerializer, JarCreateSerializer
+from .pagination import JarKeysetPagination
+from .permissions import JarPermission, WebhookSignaturePermission
+from .serializers import (AmountOfJarBucketSerializer, AmountOfJarSerializer, JarSerializer, JarStatusPushSerializer,
+                          JarTagSerializer, JarUpdateSerializer, JarsSerializer, JarCreateSerializer,
+                          StatisticQuerySerializer)
+from .tasks import enqueue_snapshots
+from .utils import JARS_CACHE_NAMESPACE, TAGS_CACHE_NAMESPACE, downsample_statistic
 
 
-class JarListCreateView(generics.ListCreateAPIView):
+class JarListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     API view for listing and creating Jars.
 
-    * Allows GET requests for listing.
+    * Allows GET requests for listing (cursor paginated, supports conditional requests).
     * Allows POST requests for creating (requires active volunteer).
 
     Query Parameters:
         - `search`: Search by title.
         - `ordering`: Order by date_added or fill percentage.
         - `tags`: Filter by tags name.
+        - `cursor`: Cursor from the `next`/`previous` link of the previous page.
+        - `page_size`: Number of jars per page.
 
     Example:
     ```
     /api/jars/?search=example&ordering=-date_added&tags=name
     ```
 
+    Response Example (for listing):
+    ```json
+    {
+        "next": "http://example.com/api/jars/?cursor=eyJ2Ij...&ordering=-date_added",
+        "previous": null,
+        "results": [
+            // Jar items
+        ]
+    }
+    ```
+
     POST Request Body (for creating a new Jar):
     ```json
     {
@@ -54,17 +75,25 @@ class JarListCreateView(generics.ListCreateAPIView):
     ```
     """
     permission_classes = [JarPermission]
-    queryset = Jar.objects.all()
+    queryset = Jar.objects.for_listing()
     serializer_class = JarsSerializer
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     filterset_class = JarFilter
     search_fields = ['title']
+    pagination_class = JarKeysetPagination
 
     def get_queryset(self) -> QuerySet:
         """
         Get Jars without date_closed.
         """
-        return Jar.objects.filter(date_closed=None)
+        return Jar.objects.for_listing().filter(date_closed=None)
+
+    def get_validators(self) -> tuple[list, object]:
+        """
+        Validators of the list: the latest modification of open jars and their count.
+        """
+        state = Jar.objects.filter(date_closed=None).aggregate(modified=Max('modified_at'), count=Count('id'))
+        return [state['modified'], state['count']], state['modified']
 
     def get_serializer_class(self) -> Type[JarCreateSerializer | JarsSerializer]:
         """
@@ -76,11 +105,12 @@ class JarListCreateView(generics.ListCreateAPIView):
         return self.serializer_class
 
 
-class JarsListForBannerView(generics.ListAPIView):
+class JarsListForBannerView(CachedListMixin, generics.ListAPIView):
     """
     API view for listing Jars for banner display.
 
     * Allows GET requests for listing.
+    * Responses are cached until a jar, tag or sum changes.
 
     Example:
     ```
@@ -111,19 +141,21 @@ class JarsListForBannerView(generics.ListAPIView):
     """
     serializer_class = JarsSerializer
     permission_classes = [AllowAny]
+    authentication_classes = []
+    cache_namespace = JARS_CACHE_NAMESPACE
 
     def get_queryset(self) -> QuerySet:
         """
         Get the first 8 Jars ordered by 'dd_order'.
         """
-        return Jar.objects.filter(date_closed=None).order_by('dd_order')[:8]
+        return Jar.objects.for_listing().filter(date_closed=None).order_by('dd_order')[:8]
 
 
-class JarRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class JarRetrieveUpdateDestroyView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view for retrieving, updating, and deleting a specific Jar.
 
-    * Allows GET requests for retrieving.
+    * Allows GET requests for retrieving (supports conditional requests).
     * Allows PUT requests for updating (requires active volunteer).
     * Allows DELETE requests for deleting (requires active volunteer).
 
@@ -167,7 +199,7 @@ class JarRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     ```
     """
     permission_classes = [JarPermission]
-    queryset = Jar.objects.all()
+    queryset = Jar.objects.for_detail()
     serializer_class = JarSerializer
 
     def get_serializer_class(self) -> Type[JarUpdateSerializer | JarSerializer]:
@@ -179,12 +211,24 @@ class JarRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
             return JarUpdateSerializer
         return self.serializer_class
 
+    def get_validators(self) -> tuple[list | None, object]:
+        """
+        Validators of the jar: modification dates of the jar and its album images.
+        """
+        state = Jar.objects.filter(pk=self.kwargs['pk']).aggregate(
+            modified=Max('modified_at'), album_modified=Max('jaralbum__modified_at'), album_count=Count('jaralbum'))
+        if state['modified'] is None:
+            return None, None
+        last_modified = max(filter(None, [state['modified'], state['album_modified']]))
+        return [state['modified'], state['album_modified'], state['album_count']], last_modified
+
 
-class TagsListView(generics.ListAPIView):
+class TagsListView(CachedListMixin, generics.ListAPIView):
     """
     API view for listing Tags for jars display.
 
     * Allows GET requests for listing.
+    * Responses are cached until a tag changes.
 
     Example:
     ```
@@ -203,13 +247,133 @@ class TagsListView(generics.ListAPIView):
     ```
     """
     permission_classes = [AllowAny]
+    authentication_classes = []
     queryset = JarTag.objects.all()
     serializer_class = JarTagSerializer
+    cache_namespace = TAGS_CACHE_NAMESPACE
 
 
-class StatisticListView(generics.ListAPIView):
+class StatisticListView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    API view for listing the sums history of a Jar.
+
+    * Allows GET requests for listing (supports conditional requests).
+
+    Query Parameters:
+        - `bucket`: Aggregate the history by `day`, `week` or `month` in the database.
+        - `from`: Start of the period (ISO 8601).
+        - `to`: End of the period (ISO 8601).
+        - `points`: Downsample the history to at most N points (aggregates by day if no bucket).
+        - `dense`: Fill buckets without snapshots with the carried-forward sum (aggregates by day if no bucket).
+
+    Example:
+    ```
+    /api/jars/1/statistic/?bucket=week&from=2024-01-01T00:00:00Z&points=30
+    ```
+
+    Response Example (with bucket):
+    ```json
+    [
+        {
+            "date": "2024-01-01T00:00:00+02:00",
+            "sum": 100000,
+            "incomes": 20000
+        },
+        // Additional buckets
+    ]
+    ```
+    """
     permission_classes = [AllowAny]
     serializer_class = AmountOfJarSerializer
 
+    def get_query_params(self) -> dict:
+        """
+        Returns the validated query parameters of the statistic.
+        """
+        params = StatisticQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
     def get_queryset(self):
-        return AmountOfJar.objects.filter(jar=self.kwargs.get('pk'))
+        queryset = AmountOfJar.objects.filter(jar=self.kwargs.get('pk')).only(
+            'id', 'sum', 'incomes', 'date_added', 'last_seen')
+        params = self.get_query_params()
+        if params.get('from'):
+            queryset = queryset.filter(date_added__gte=params['from'])
+        if params.get('to'):
+            queryset = queryset.filter(date_added__lte=params['to'])
+        return queryset
+
+    def list(self, request, *args, **kwargs) -> Response:
+        """
+        Returns raw snapshots, or buckets aggregated in the database if `bucket`, `points`
+        or `dense` is set.
+        """
+        params = self.get_query_params()
+        bucket = params.get('bucket') or ('day' if params.get('points') or params['dense'] else None)
+        if not bucket:
+            return super().list(request, *args, **kwargs)
+
+        points = AmountOfJar.objects.aggregate_by_bucket(
+            self.kwargs.get('pk'), bucket, params.get('from'), params.get('to'), params['dense'])
+        if params.get('points'):
+            points = downsample_statistic(points, params['points'])
+        return Response(AmountOfJarBucketSerializer(points, many=True).data)
+
+    def get_validators(self) -> tuple[list, object]:
+        """
+        Validators of the history: the latest snapshot and poll dates and the number of snapshots.
+        """
+        state = AmountOfJar.objects.filter(jar=self.kwargs.get('pk')).aggregate(
+            latest=Max('date_added'), last_seen=Max('last_seen'), count=Count('id'))
+        last_modified = max(filter(None, [state['latest'], state['last_seen']]), default=None)
+        return [state['latest'], state['last_seen'], state['count']], last_modified
+
+
+class JarStatusPushView(generics.GenericAPIView):
+    """
+    API view for pushed jar states, an alternative to polling the monobank API.
+
+    * Allows POST requests signed as described in `WebhookSignaturePermission`.
+
+    Accepts one jar state or a list of up to `MONOBANK_WEBHOOK_MAX_ITEMS` states. The states
+    are validated without database queries and queued for the batch snapshot writer used by
+    the poller, so the request does no database writes. States of unknown or closed jars are
+    dropped by the writer.
+
+    Request Example:
+    ```json
+    [
+        {
+            "jarId": "4Xy9wQ2bTe",
+            "jarAmount": 100000,
+            "jarGoal": 500000,
+            "jarStatus": "ACTIVE"
+        },
+        // Additional jar states
+    ]
+    ```
+
+    Response Example (202 Accepted):
+    ```json
+    {
+        "queued": 1
+    }
+    ```
+    """
+    permission_classes = [WebhookSignaturePermission]
+    authentication_classes = []
+    serializer_class = JarStatusPushSerializer
+
+    def post(self, request, *args, **kwargs) -> Response:
+        many = isinstance(request.data, list)
+        if many and len(request.data) > settings.MONOBANK_WEBHOOK_MAX_ITEMS:
+            return Response(
+                {'detail': f'Push at most {settings.MONOBANK_WEBHOOK_MAX_ITEMS} jar states at once.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = self.get_serializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data if many else [serializer.validated_data]
+        enqueue_snapshots([dict(item) for item in items])
+        return Response({'queued': len(items)}, status=status.HTTP_202_ACCEPTED)
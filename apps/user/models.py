@@ -5,11 +5,12 @@ from cloudinary.models import CloudinaryField
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinLengthValidator
 
+from shared.cloudinary.mixins import TrackedImagesMixin
 from .managers import CustomUserManager
 from .validators import PHONE_REGEX
 
 
-class User(AbstractUser):
+class User(TrackedImagesMixin, AbstractUser):
     """
     User model for the application.
 
@@ -56,6 +57,7 @@ class User(AbstractUser):
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()
+    tracked_image_fields = ('photo_profile',)
 
     class Meta:
         verbose_name = _('user')
@@ -1,14 +1,47 @@
+from django.db import transaction
 from rest_framework import serializers
 from apps.user.models import User
-from shared.cloudinary.utils import get_full_image_url
+from shared.cloudinary.serializers import SignedUploadField
+from shared.cloudinary.utils import acquire_uploaded_image, get_full_image_url, upload_image
+from shared.images.utils import preprocess_image
 
 
 class UserSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the authenticated user.
+
+    Fields:
+    - `id` (int): The unique identifier for the user.
+    - `email` (str): Email address of the user.
+    - `photo_profile`: A method field returning the full profile photo URL.
+    - `photo_profile_upload` (dict): Profile photo uploaded directly to Cloudinary, write only.
+    - `photo_profile_file` (File): Profile photo file, write only. The photo is preprocessed (see
+      `preprocess_image`) and a photo with the content of an already uploaded image reuses that image.
+    """
     photo_profile = serializers.SerializerMethodField()
+    photo_profile_upload = SignedUploadField(folder='photo_profile', source='photo_profile', required=False)
+    photo_profile_file = serializers.FileField(write_only=True, required=False)
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'photo_profile']
+        fields = ['id', 'email', 'photo_profile', 'photo_profile_upload', 'photo_profile_file']
+
+    @transaction.atomic
+    def update(self, instance, validated_data) -> User:
+        """
+        Custom method to update the user, uploading the profile photo file if given, or taking
+        a reference to the directly uploaded profile photo.
+
+        Returns:
+            - User: The updated User instance.
+        """
+        photo_profile_file = validated_data.pop('photo_profile_file', None)
+        if photo_profile_file is not None:
+            validated_data['photo_profile'] = upload_image(
+                instance, 'photo_profile', preprocess_image(photo_profile_file))
+        elif validated_data.get('photo_profile') is not None:
+            validated_data['photo_profile'] = acquire_uploaded_image(validated_data['photo_profile'])
+        return super().update(instance, validated_data)
 
     def get_photo_profile(self, obj):
         """
@@ -8,11 +8,10 @@ from .models import User
 @receiver(pre_save, sender=User)
 def delete_old_profile_picture(sender, instance, **kwargs) -> None:
     """Deletes the old image from Cloudinary if it has changed"""
-    image_pre_save(sender, instance, field_name='photo_profile')
+    image_pre_save(sender, instance, field_name='photo_profile', update_fields=kwargs.get('update_fields'))
 
 
 @receiver(pre_delete, sender=User)
 def delete_profile_picture(sender, instance, **kwargs) -> None:
-    """Delete the image from Cloudinary before deleting the profile"""
-    old_instance = sender.objects.get(pk=instance.pk)
-    delete_cloudinary_image(old_instance, field_name='photo_profile')
+    """Requests deleting the image from Cloudinary with the profile"""
+    delete_cloudinary_image(instance, field_name='photo_profile')
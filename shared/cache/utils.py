@@ -0,0 +1,91 @@
+import logging
+from hashlib import md5
+
+from django.core.cache import caches
+from django.db import transaction
+from redis.exceptions import RedisError
+
+
+logger = logging.getLogger(__name__)
+
+
+def _call_cache(method, *args, **kwargs):
+    """
+    Calls a method of the default cache, falling back to the local-memory cache
+    if Redis is unavailable.
+
+    Parameters:
+    - method (str): The name of the cache method.
+
+    Returns:
+    - The result of the cache method.
+    """
+    try:
+        return getattr(caches['default'], method)(*args, **kwargs)
+    except RedisError as e:
+        logger.warning(f'Cache {method} failed, using fallback cache: {e}')
+        return getattr(caches['fallback'], method)(*args, **kwargs)
+
+
+def cache_get(key, default=None):
+    """Returns the cached value for the key or the default."""
+    return _call_cache('get', key, default)
+
+
+def cache_set(key, value, timeout) -> None:
+    """Stores the value under the key for `timeout` seconds."""
+    _call_cache('set', key, value, timeout)
+
+
+def get_cache_version(namespace) -> int:
+    """
+    Returns the current version of the namespace.
+
+    Parameters:
+    - namespace (str): The name of the cached data group.
+
+    Returns:
+    - int: The current version of the namespace.
+    """
+    key = f'{namespace}:version'
+    version = _call_cache('get', key)
+    if version is None:
+        _call_cache('add', key, 1, None)
+        version = _call_cache('get', key, 1)
+    return version
+
+
+def bump_cache_version(namespace) -> None:
+    """
+    Bumps the version of the namespace, so all keys built with the old version are ignored.
+
+    The bump is deferred until the current transaction is committed, so a concurrent
+    request can't cache the old data under the new version.
+
+    Parameters:
+    - namespace (str): The name of the cached data group.
+
+    Returns:
+    - None
+    """
+    def bump():
+        key = f'{namespace}:version'
+        _call_cache('add', key, 1, None)
+        _call_cache('incr', key)
+
+    transaction.on_commit(bump)
+
+
+def build_versioned_key(namespace, identifier) -> str:
+    """
+    Builds a cache key for the identifier in the current version of the namespace.
+
+    Parameters:
+    - namespace (str): The name of the cached data group.
+    - identifier (str): The identifier of cached data, e.g. the request path.
+
+    Returns:
+    - str: The cache key.
+    """
+    digest = md5(identifier.encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'{namespace}:{get_cache_version(namespace)}:{digest}'
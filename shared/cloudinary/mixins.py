@@ -0,0 +1,58 @@
+class TrackedImagesMixin:
+    """
+    Mixin for models to remember the images they were loaded with.
+
+    The images of the `tracked_image_fields` are recorded when the instance is loaded from the
+    database and after every save, so the image pre_save signals can tell whether an image
+    changed without querying the old instance.
+
+    Example:
+        class Jar(TrackedImagesMixin, models.Model):
+            tracked_image_fields = ('title_img',)
+    """
+    tracked_image_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.store_loaded_images()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.store_loaded_images(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.store_loaded_images(kwargs.get('update_fields'))
+
+    def store_loaded_images(self, field_names=None) -> None:
+        """
+        Records the current images as the ones stored in the database.
+
+        Deferred image fields are not recorded.
+
+        Parameters:
+        - field_names (Iterable[str] | None): The saved fields, all tracked fields by default.
+        """
+        loaded_images = self.__dict__.setdefault('_loaded_images', {})
+        for field_name in self.tracked_image_fields:
+            if field_name in self.__dict__ and (field_names is None or field_name in field_names):
+                loaded_images[field_name] = self.__dict__[field_name]
+
+    def get_loaded_image(self, field_name):
+        """
+        Returns the image stored in the database, querying it only if it was not recorded.
+
+        Parameters:
+        - field_name (str): The name of the image field.
+
+        Returns:
+        - CloudinaryResource | None: The stored image.
+        """
+        loaded_images = self.__dict__.get('_loaded_images', {})
+        if field_name in loaded_images:
+            return loaded_images[field_name]
+        if self.pk is None:
+            return None
+        return type(self)._default_manager.filter(pk=self.pk).values_list(field_name, flat=True).first()
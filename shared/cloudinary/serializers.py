@@ -0,0 +1,49 @@
+from cloudinary import CloudinaryResource
+from rest_framework import serializers
+
+from .utils import verify_upload
+
+
+class SignedUploadField(serializers.Field):
+    """
+    Write-only field for an image uploaded directly to Cloudinary with `sign_upload`.
+
+    Accepts the `public_id`, `version` and `signature` of the upload response (and optionally
+    its `format`), verifies the signature and the folder, and returns the image as a
+    CloudinaryResource, which can be assigned to a CloudinaryField.
+
+    Example:
+    ```json
+    {
+        "public_id": "jar_title_img/abcdef",
+        "version": 1700000000,
+        "signature": "4d0c1c0fdc2fa6b3e1b8bd4b1d2dd4be6c0a4b5e",
+        "format": "jpg"
+    }
+    ```
+    """
+    default_error_messages = {
+        'invalid': 'Expected an object with public_id, version and signature of the upload.',
+        'folder': 'The image must be uploaded to the {folder} folder.',
+        'signature': 'The upload signature is invalid.',
+    }
+
+    def __init__(self, folder, **kwargs):
+        self.folder = folder
+        kwargs['write_only'] = True
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data) -> CloudinaryResource:
+        try:
+            public_id, version, signature = str(data['public_id']), str(data['version']), str(data['signature'])
+        except (KeyError, TypeError):
+            self.fail('invalid')
+        if not public_id.startswith(f'{self.folder}/'):
+            self.fail('folder', folder=self.folder)
+        if not verify_upload(public_id, version, signature, self.folder):
+            self.fail('signature')
+        return CloudinaryResource(
+            public_id, version=version, format=data.get('format'), type='upload', resource_type='image')
+
+    def to_representation(self, value):
+        return value.url if value else None
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .views import SignedUploadView
+
+
+urlpatterns = [
+    path('signature/', SignedUploadView.as_view(), name='signed_upload'),
+]
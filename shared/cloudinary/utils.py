@@ -1,9 +1,38 @@
+import hashlib
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import mkstemp
+from time import time
+
+import cloudinary
 from cloudinary import uploader as cloudinary_uploader
+from cloudinary.utils import api_sign_request, verify_api_response_signature
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+
+from shared.models import CloudinaryDeletion, RegisteredImage
+
+
+IMAGE_PENDING = 'pending'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+IMAGE_STATUS_CHOICES = [
+    (IMAGE_PENDING, _('pending')),
+    (IMAGE_READY, _('ready')),
+    (IMAGE_FAILED, _('failed')),
+]
 
 
 def delete_cloudinary_image(old_instance, field_name) -> None:
     """
-    Deletes an image from Cloudinary.
+    Requests deleting an image from Cloudinary.
+
+    The image is released within the current transaction (see `release_image`) and deleted
+    later by the `drain_cloudinary_deletions` task once no other field uses it.
 
     Parameters:
     - old_instance: The old instance of the object.
@@ -12,35 +41,69 @@ def delete_cloudinary_image(old_instance, field_name) -> None:
     Returns:
     - None
     """
-    old_image = getattr(old_instance, field_name, None)
-    if old_image and old_image.public_id:
-        cloudinary_uploader.destroy(old_image.public_id)
+    release_image(getattr(old_instance, field_name, None))
 
 
-def image_pre_save(sender, instance, field_name) -> None:
+def release_image(image) -> None:
+    """
+    Releases an image which is no longer used by an image field.
+
+    The reference count of a registered image is decreased, and the image is only recorded in
+    the CloudinaryDeletion outbox when no other field uses it. Images missing from the
+    registry, e.g. stored before it, are recorded in the outbox at once.
+
+    Parameters:
+    - image (CloudinaryResource | None): The released image.
+
+    Returns:
+    - None
+    """
+    public_id = getattr(image, 'public_id', None)
+    if not public_id:
+        return
+    if RegisteredImage.objects.filter(public_id=public_id, ref_count__gt=1).update(ref_count=F('ref_count') - 1):
+        return
+
+    RegisteredImage.objects.filter(public_id=public_id).delete()
+    CloudinaryDeletion.objects.create(
+        public_id=public_id,
+        type=image.type or 'upload',
+        resource_type=image.resource_type or 'image',
+    )
+
+
+def image_pre_save(sender, instance, field_name, update_fields=None) -> None:
     """
     Handles actions before saving an object with an image.
 
+    The new image is compared with the one the instance was loaded with (see
+    `TrackedImagesMixin`), so no query is made unless the image was not loaded.
+
     Parameters:
     - sender: The model class.
     - instance: The instance of the object being saved.
     - field_name (str): The name of the image field.
+    - update_fields (frozenset | None): The saved fields, all fields by default.
 
     Returns:
     - None
     """
-    try:
-        old_instance = sender.objects.get(pk=instance.pk)
-        old_image = getattr(old_instance, field_name, None)
-        new_image = getattr(instance, field_name, None)
-        if old_image and old_image != new_image:
-            delete_cloudinary_image(old_instance, field_name)
+    if update_fields is not None and field_name not in update_fields:
+        return
 
-        if not new_image:
-            instance.img_alt = None
+    old_image = instance.get_loaded_image(field_name)
+    new_image = getattr(instance, field_name, None)
+    # An image provided by `upload_image` holds a new reference, even if it is the old image
+    new_reference = getattr(new_image, 'new_reference', False)
+    if old_image and (old_image.public_id != getattr(new_image, 'public_id', None) or new_reference):
+        release_image(old_image)
+    if new_reference:
+        new_image.new_reference = False
 
-    except sender.DoesNotExist:
-        pass
+    # A pending image is still being uploaded, `upload_spooled_image` settles the alt text
+    pending = getattr(instance, f'{field_name}_status', None) == IMAGE_PENDING
+    if instance.pk is not None and not new_image and not pending:
+        instance.img_alt = None
 
 
 def get_full_image_url(obj, field_name) -> (str | None):
@@ -58,3 +121,347 @@ def get_full_image_url(obj, field_name) -> (str | None):
     if image:
         return image.url
     return None
+
+
+def assign_image(instance, field_name, image) -> None:
+    """
+    Assigns an uploaded image to the image field of an instance, which is saved by the caller.
+
+    An uploaded file is provided by `upload_image`, so an image with the same content is reused.
+    With `IMAGE_UPLOAD_ASYNC` an uploaded file is spooled to `IMAGE_UPLOAD_SPOOL_DIR` instead, the
+    field keeps its current image and the `<field_name>_status` field is set to pending. The
+    upload task is started when the transaction is committed and sets the image when done.
+
+    Parameters:
+    - instance: The instance of the object.
+    - field_name (str): The name of the image field.
+    - image (UploadedFile | CloudinaryResource | None): The uploaded file, an image uploaded
+      directly to Cloudinary (see `acquire_uploaded_image`), or None to remove the image.
+
+    Returns:
+    - None
+    """
+    status_field = f'{field_name}_status'
+    if isinstance(image, cloudinary.CloudinaryResource):
+        image = acquire_uploaded_image(image)
+    elif isinstance(image, UploadedFile) and not settings.IMAGE_UPLOAD_ASYNC:
+        image = upload_image(instance, field_name, image)
+    if not isinstance(image, UploadedFile):
+        setattr(instance, field_name, image)
+        setattr(instance, status_field, IMAGE_READY)
+        return
+
+    from shared.tasks import upload_spooled_image
+
+    path = spool_image(image)
+    setattr(instance, status_field, IMAGE_PENDING)
+    transaction.on_commit(
+        lambda: upload_spooled_image.delay(instance._meta.label, instance.pk, field_name, path)
+    )
+
+
+def spool_image(image) -> str:
+    """
+    Writes an uploaded image to `IMAGE_UPLOAD_SPOOL_DIR`.
+
+    Parameters:
+    - image (UploadedFile): The uploaded image.
+
+    Returns:
+    - str: The path of the spooled image.
+    """
+    os.makedirs(settings.IMAGE_UPLOAD_SPOOL_DIR, exist_ok=True)
+    descriptor, path = mkstemp(suffix=os.path.splitext(image.name or '')[1], dir=settings.IMAGE_UPLOAD_SPOOL_DIR)
+    with os.fdopen(descriptor, 'wb') as spooled:
+        for chunk in image.chunks():
+            spooled.write(chunk)
+    return path
+
+
+def get_content_hash(image) -> str:
+    """
+    Calculates the SHA-256 of an uploaded image.
+
+    Parameters:
+    - image (UploadedFile | str): The uploaded image or the path of a spooled image.
+
+    Returns:
+    - str: The hex digest of the image content.
+    """
+    digest = hashlib.sha256()
+    if isinstance(image, str):
+        with open(image, 'rb') as spooled:
+            for chunk in iter(lambda: spooled.read(UploadedFile.DEFAULT_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    for chunk in image.chunks():
+        digest.update(chunk)
+    image.seek(0)
+    return digest.hexdigest()
+
+
+def remove_spooled_image(path) -> None:
+    """
+    Removes a spooled image, if it still exists.
+
+    Parameters:
+    - path (str): The path of the spooled image.
+
+    Returns:
+    - None
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def acquire_registered_images(content_hashes) -> dict:
+    """
+    Takes references to the registered images with the given contents.
+
+    Parameters:
+    - content_hashes (list): SHA-256 of the images, once per field the image is used by.
+
+    Returns:
+    - dict: The registered images (CloudinaryResource) by their content hash.
+    """
+    counts = Counter(content_hashes)
+    images = {}
+    for registered in RegisteredImage.objects.filter(content_hash__in=counts):
+        # The image may have been released by a concurrent request since it was read
+        if RegisteredImage.objects.filter(pk=registered.pk).update(
+                ref_count=F('ref_count') + counts[registered.content_hash]):
+            images[registered.content_hash] = cloudinary.CloudinaryResource(
+                registered.public_id,
+                version=registered.version or None,
+                format=registered.format or None,
+                type=registered.type,
+                resource_type=registered.resource_type,
+            )
+    return images
+
+
+def register_image(content_hash, image, ref_count=1):
+    """
+    Registers an uploaded image by its content.
+
+    If an image with the same content was registered concurrently, that image is used
+    and the uploaded one is released.
+
+    Parameters:
+    - content_hash (str): SHA-256 of the image.
+    - image (CloudinaryResource): The uploaded image.
+    - ref_count (int): Number of fields the image is used by.
+
+    Returns:
+    - CloudinaryResource: The registered image.
+    """
+    try:
+        with transaction.atomic():
+            RegisteredImage.objects.create(
+                content_hash=content_hash,
+                public_id=image.public_id,
+                version=image.version or '',
+                format=image.format or '',
+                type=image.type,
+                resource_type=image.resource_type,
+                ref_count=ref_count,
+            )
+    except IntegrityError:
+        registered = acquire_registered_images([content_hash] * ref_count).get(content_hash)
+        if registered is None:
+            return image
+        release_image(image)
+        return registered
+    return image
+
+
+def acquire_uploaded_images(images) -> None:
+    """
+    Takes references to images uploaded directly to Cloudinary, registering them by their
+    public id.
+
+    The same upload response may be submitted for several fields, so the image is only
+    deleted from Cloudinary when none of them uses it anymore.
+
+    Parameters:
+    - images (list[CloudinaryResource]): The uploaded images, once per field the image is used by.
+
+    Returns:
+    - None
+    """
+    counts = Counter(image.public_id for image in images)
+    images = {image.public_id: image for image in images}
+    for public_id, count in counts.items():
+        if RegisteredImage.objects.filter(public_id=public_id).update(ref_count=F('ref_count') + count):
+            continue
+        image = images[public_id]
+        try:
+            with transaction.atomic():
+                RegisteredImage.objects.create(
+                    public_id=public_id,
+                    version=image.version or '',
+                    format=image.format or '',
+                    type=image.type or 'upload',
+                    resource_type=image.resource_type or 'image',
+                    ref_count=count,
+                )
+        except IntegrityError:
+            # Registered concurrently
+            RegisteredImage.objects.filter(public_id=public_id).update(ref_count=F('ref_count') + count)
+
+
+def acquire_uploaded_image(image):
+    """
+    Takes a reference to an image uploaded directly to Cloudinary, see `acquire_uploaded_images`.
+
+    As with `upload_image`, the returned image holds a new reference, which `image_pre_save`
+    balances by releasing the old image of the field, even if it is the same image.
+
+    Parameters:
+    - image (CloudinaryResource): The uploaded image.
+
+    Returns:
+    - CloudinaryResource: The image, which can be assigned to the field.
+    """
+    acquire_uploaded_images([image])
+    image.new_reference = True
+    return image
+
+
+def send_image(instance, field_name, image):
+    """
+    Uploads an image to Cloudinary with the upload options of the image field, as saving
+    the instance would.
+
+    Parameters:
+    - instance: The instance of the object the image belongs to.
+    - field_name (str): The name of the image field.
+    - image (UploadedFile | str): The uploaded image or the path of a spooled image.
+
+    Returns:
+    - CloudinaryResource: The uploaded image.
+    """
+    field = instance._meta.get_field(field_name)
+    options = {'type': field.type, 'resource_type': field.resource_type}
+    options.update({key: value(instance) if callable(value) else value for key, value in field.options.items()})
+    if hasattr(image, 'seekable') and image.seekable():
+        image.seek(0)
+    return cloudinary_uploader.upload_resource(image, **options)
+
+
+def upload_image(instance, field_name, image):
+    """
+    Provides an image for the image field of an instance.
+
+    An image with the same content which is already registered is reused, otherwise the
+    image is uploaded to Cloudinary (see `send_image`) and registered. Either way the returned
+    image holds a new reference, which `image_pre_save` balances by releasing the old image
+    of the field, even if it is the same image.
+
+    Parameters:
+    - instance: The instance of the object the image belongs to.
+    - field_name (str): The name of the image field.
+    - image (UploadedFile | str): The uploaded image or the path of a spooled image.
+
+    Returns:
+    - CloudinaryResource: The image, which can be assigned to the field.
+    """
+    content_hash = get_content_hash(image)
+    provided = acquire_registered_images([content_hash]).get(content_hash)
+    if provided is None:
+        provided = register_image(content_hash, send_image(instance, field_name, image))
+    provided.new_reference = True
+    return provided
+
+
+def upload_images(instances, field_name, images) -> list:
+    """
+    Provides images for the image fields of instances.
+
+    Registered images are reused as in `upload_image`, the others are uploaded to Cloudinary
+    concurrently in up to `IMAGE_UPLOAD_POOL_SIZE` threads, each content once. If an upload
+    fails, the other uploaded images are deleted and the error is raised.
+
+    Parameters:
+    - instances (list): The instances the images belong to.
+    - field_name (str): The name of the image field.
+    - images (list): The uploaded images, in the order of the instances.
+
+    Returns:
+    - list[CloudinaryResource]: The images, in the order of the instances.
+    """
+    if not images:
+        return []
+    content_hashes = [get_content_hash(image) for image in images]
+    provided = acquire_registered_images(content_hashes)
+    missing = {}
+    for instance, image, content_hash in zip(instances, images, content_hashes):
+        if content_hash not in provided:
+            missing.setdefault(content_hash, (instance, image))
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(settings.IMAGE_UPLOAD_POOL_SIZE, len(missing))) as executor:
+            futures = {
+                content_hash: executor.submit(send_image, instance, field_name, image)
+                for content_hash, (instance, image) in missing.items()
+            }
+
+        uploaded, error = {}, None
+        for content_hash, future in futures.items():
+            try:
+                uploaded[content_hash] = future.result()
+            except Exception as e:
+                error = error or e
+        if error:
+            for image in uploaded.values():
+                cloudinary_uploader.destroy(image.public_id)
+            raise error
+
+        counts = Counter(content_hashes)
+        for content_hash, image in uploaded.items():
+            provided[content_hash] = register_image(content_hash, image, counts[content_hash])
+
+    return [provided[content_hash] for content_hash in content_hashes]
+
+
+def sign_upload(folder) -> dict:
+    """
+    Signs the parameters of an upload from the browser directly to Cloudinary.
+
+    Cloudinary accepts the signature for an hour after its timestamp, and only for uploads
+    into the given folder.
+
+    Parameters:
+    - folder (str): The folder the image is uploaded to.
+
+    Returns:
+    - dict: The parameters of the upload request, including the signature and the upload URL.
+    """
+    config = cloudinary.config()
+    params = {'folder': folder, 'timestamp': int(time())}
+    return {
+        **params,
+        'signature': api_sign_request(params, config.api_secret, config.signature_algorithm),
+        'api_key': config.api_key,
+        'upload_url': f'https://api.cloudinary.com/v1_1/{config.cloud_name}/image/upload',
+    }
+
+
+def verify_upload(public_id, version, signature, folder) -> bool:
+    """
+    Verifies that an image was uploaded to Cloudinary into the folder, using the signature of
+    the upload response, without a request to Cloudinary.
+
+    Parameters:
+    - public_id (str): The public id from the upload response.
+    - version (str | int): The version from the upload response.
+    - signature (str): The signature from the upload response.
+    - folder (str): The folder the image must be uploaded to.
+
+    Returns:
+    - bool: True if the upload response is authentic and the image is in the folder.
+    """
+    return public_id.startswith(f'{folder}/') and verify_api_response_signature(public_id, version, signature)
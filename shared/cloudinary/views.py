@@ -0,0 +1,45 @@
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .utils import sign_upload
+
+
+class SignedUploadView(APIView):
+    """
+    API view issuing signed parameters for an image upload from the browser directly to Cloudinary.
+
+    * Requires authentication.
+    * Allows GET requests.
+
+    The browser posts the image with the returned parameters to `upload_url` and submits the
+    `public_id`, `version` and `signature` of the Cloudinary response instead of the file.
+
+    Query Parameters:
+        - `folder`: The folder of the image, one of `CLOUDINARY_SIGNED_UPLOAD_FOLDERS`.
+
+    Example:
+    ```
+    /api/uploads/signature/?folder=jar_album
+    ```
+
+    Response Example:
+    ```json
+    {
+        "folder": "jar_album",
+        "timestamp": 1700000000,
+        "signature": "4d0c1c0fdc2fa6b3e1b8bd4b1d2dd4be6c0a4b5e",
+        "api_key": "123456789012345",
+        "upload_url": "https://api.cloudinary.com/v1_1/demo/image/upload"
+    }
+    ```
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs) -> Response:
+        folder = request.query_params.get('folder')
+        if folder not in settings.CLOUDINARY_SIGNED_UPLOAD_FOLDERS:
+            raise ValidationError({'folder': f'Must be one of {", ".join(settings.CLOUDINARY_SIGNED_UPLOAD_FOLDERS)}.'})
+        return Response(sign_upload(folder))
@@ -0,0 +1,123 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Returns the process pool preprocessing images, creating it on first use.
+
+    The processes are spawned rather than forked, as the web and Celery workers run threads.
+
+    Returns:
+    - ProcessPoolExecutor: The pool of `IMAGE_PREPROCESS_WORKERS` processes.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PREPROCESS_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def _preprocess(content, max_dimension, image_format, quality) -> bytes | None:
+    """
+    Strips the metadata of an image, downscales it and re-encodes it, in a pool process.
+
+    Parameters:
+    - content (bytes): The content of the image.
+    - max_dimension (int): The maximal width and height of the image.
+    - image_format (str): The Pillow format to encode the image with, e.g. `WEBP`.
+    - quality (int): The encoding quality.
+
+    Returns:
+    - bytes | None: The content of the preprocessed image, or None if it is left as is.
+    """
+    try:
+        with Image.open(BytesIO(content)) as image:
+            if getattr(image, 'is_animated', False):
+                return None
+            # Decodes large JPEGs at a reduced scale
+            image.draft('RGB', (max_dimension, max_dimension))
+            # Applies the EXIF orientation, as the EXIF data is not kept
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            if image_format == 'JPEG' or not image.has_transparency_data:
+                image = image.convert('RGB')
+            elif image.mode != 'RGBA':
+                image = image.convert('RGBA')
+            output = BytesIO()
+            image.save(output, format=image_format, quality=quality)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    return output.getvalue()
+
+
+def preprocess_images(images) -> list:
+    """
+    Preprocesses uploaded images before they are uploaded to Cloudinary.
+
+    The images are stripped of their metadata, downscaled to `IMAGE_PREPROCESS_MAX_DIMENSION`
+    and re-encoded as `IMAGE_PREPROCESS_FORMAT` concurrently in a process pool. Values which
+    are not uploaded files, animated images and files Pillow can't read are returned as is,
+    as are all images if `IMAGE_PREPROCESS` is off.
+
+    Parameters:
+    - images (list): The uploaded images (UploadedFile), or other values of image fields.
+
+    Returns:
+    - list: The preprocessed images, in the order of the given ones.
+    """
+    indexes = [index for index, image in enumerate(images) if isinstance(image, UploadedFile)]
+    if not indexes or not settings.IMAGE_PREPROCESS:
+        return list(images)
+
+    image_format = settings.IMAGE_PREPROCESS_FORMAT
+    contents = [b''.join(images[index].chunks()) for index in indexes]
+    try:
+        processed = list(get_executor().map(
+            _preprocess,
+            contents,
+            [settings.IMAGE_PREPROCESS_MAX_DIMENSION] * len(contents),
+            [image_format] * len(contents),
+            [settings.IMAGE_PREPROCESS_QUALITY] * len(contents),
+        ))
+    except BrokenProcessPool as e:
+        global _executor
+        logger.warning(f'Image preprocessing failed, uploading the original images: {e}')
+        _executor = None
+        return list(images)
+
+    result = list(images)
+    extension = image_format.lower()
+    for index, content in zip(indexes, processed):
+        if content is not None:
+            name = f'{os.path.splitext(images[index].name or "image")[0]}.{extension}'
+            result[index] = SimpleUploadedFile(name, content, content_type=f'image/{extension}')
+    return result
+
+
+def preprocess_image(image):
+    """
+    Preprocesses one uploaded image, see `preprocess_images`.
+
+    Parameters:
+    - image (UploadedFile | None): The uploaded image, or another value of an image field.
+
+    Returns:
+    - The preprocessed image.
+    """
+    return preprocess_images([image])[0]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-17 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CloudinaryDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_id', models.CharField(help_text='Public id of the image', max_length=255, verbose_name='public id')),
+                ('type', models.CharField(default='upload', help_text='Delivery type of the image', max_length=31, verbose_name='type')),
+                ('resource_type', models.CharField(default='image', help_text='Resource type of the image', max_length=31, verbose_name='resource type')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of failed attempts to delete the image', verbose_name='attempts')),
+                ('date_added', models.DateTimeField(auto_now_add=True, help_text='The date and time when the deletion was requested.', verbose_name='date added')),
+            ],
+            options={
+                'verbose_name': 'cloudinary deletion',
+                'verbose_name_plural': 'Cloudinary deletions',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-17 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegisteredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the uploaded file', max_length=64, unique=True, verbose_name='content hash')),
+                ('public_id', models.CharField(help_text='Public id of the image', max_length=255, unique=True, verbose_name='public id')),
+                ('version', models.CharField(blank=True, help_text='Version of the image', max_length=31, verbose_name='version')),
+                ('format', models.CharField(blank=True, help_text='Format of the image', max_length=15, verbose_name='format')),
+                ('type', models.CharField(default='upload', help_text='Delivery type of the image', max_length=31, verbose_name='type')),
+                ('resource_type', models.CharField(default='image', help_text='Resource type of the image', max_length=31, verbose_name='resource type')),
+                ('ref_count', models.PositiveIntegerField(default=1, help_text='Number of image fields using the image', verbose_name='reference count')),
+                ('date_added', models.DateTimeField(auto_now_add=True, help_text='The date and time when the image was uploaded.', verbose_name='date added')),
+            ],
+            options={
+                'verbose_name': 'registered image',
+                'verbose_name_plural': 'Registered images',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared', '0002_registeredimage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registeredimage',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the uploaded file', max_length=64, null=True, unique=True, verbose_name='content hash'),
+        ),
+    ]
@@ -0,0 +1,133 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class CloudinaryDeletion(models.Model):
+    """
+    Outbox of images to be deleted from Cloudinary.
+
+    Rows are written in the transaction which removes the image, so the image is only
+    deleted if the transaction is committed. The `drain_cloudinary_deletions` task deletes
+    the images in batches and removes the rows.
+
+    Fields:
+        - `public_id` (str): Public id of the image.
+        - `type` (str): Delivery type of the image, e.g. `upload`.
+        - `resource_type` (str): Resource type of the image, e.g. `image`.
+        - `attempts` (PositiveIntegerField): Number of failed attempts to delete the image.
+        - `date_added` (DateTimeField): The date and time when the deletion was requested.
+    """
+    public_id = models.CharField(
+        max_length=255,
+        verbose_name=_('public id'),
+        help_text=_('Public id of the image'),
+    )
+    type = models.CharField(
+        max_length=31,
+        default='upload',
+        verbose_name=_('type'),
+        help_text=_('Delivery type of the image'),
+    )
+    resource_type = models.CharField(
+        max_length=31,
+        default='image',
+        verbose_name=_('resource type'),
+        help_text=_('Resource type of the image'),
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('attempts'),
+        help_text=_('Number of failed attempts to delete the image'),
+    )
+    date_added = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('date added'),
+        help_text=_('The date and time when the deletion was requested.'),
+    )
+
+    class Meta:
+        verbose_name = _('cloudinary deletion')
+        verbose_name_plural = _('Cloudinary deletions')
+        ordering = ['id']
+
+    def __str__(self) -> str:
+        """class method returns the deletion in string representation"""
+        return self.public_id
+
+
+class RegisteredImage(models.Model):
+    """
+    Registry of images uploaded to Cloudinary by their content.
+
+    An uploaded file with the content of a registered image reuses that image instead of
+    being uploaded again. The reference count is the number of image fields using the image,
+    which is only deleted from Cloudinary when no field uses it anymore. Images uploaded
+    directly from the browser are registered by their public id only, without a content hash.
+
+    Fields:
+        - `content_hash` (str): SHA-256 of the uploaded file, None for direct uploads.
+        - `public_id` (str): Public id of the image.
+        - `version` (str): Version of the image.
+        - `format` (str): Format of the image, e.g. `jpg`.
+        - `type` (str): Delivery type of the image, e.g. `upload`.
+        - `resource_type` (str): Resource type of the image, e.g. `image`.
+        - `ref_count` (PositiveIntegerField): Number of image fields using the image.
+        - `date_added` (DateTimeField): The date and time when the image was uploaded.
+    """
+    content_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name=_('content hash'),
+        help_text=_('SHA-256 of the uploaded file'),
+    )
+    public_id = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name=_('public id'),
+        help_text=_('Public id of the image'),
+    )
+    version = models.CharField(
+        max_length=31,
+        blank=True,
+        verbose_name=_('version'),
+        help_text=_('Version of the image'),
+    )
+    format = models.CharField(
+        max_length=15,
+        blank=True,
+        verbose_name=_('format'),
+        help_text=_('Format of the image'),
+    )
+    type = models.CharField(
+        max_length=31,
+        default='upload',
+        verbose_name=_('type'),
+        help_text=_('Delivery type of the image'),
+    )
+    resource_type = models.CharField(
+        max_length=31,
+        default='image',
+        verbose_name=_('resource type'),
+        help_text=_('Resource type of the image'),
+    )
+    ref_count = models.PositiveIntegerField(
+        default=1,
+        verbose_name=_('reference count'),
+        help_text=_('Number of image fields using the image'),
+    )
+    date_added = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('date added'),
+        help_text=_('The date and time when the image was uploaded.'),
+    )
+
+    class Meta:
+        verbose_name = _('registered image')
+        verbose_name_plural = _('Registered images')
+        ordering = ['id']
+
+    def __str__(self) -> str:
+        """class method returns the image in string representation"""
+        return self.public_id
@@ -0,0 +1,148 @@
+from time import time
+
+import redis
+from django.conf import settings
+
+
+_connection = None
+
+
+def get_redis_connection() -> redis.Redis:
+    """
+    Returns the Redis connection shared by the process.
+
+    Returns:
+    - redis.Redis: The connection to `settings.REDIS_URL`.
+    """
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.REDIS_URL)
+    return _connection
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter shared across processes, with its state kept in Redis.
+
+    The bucket refills at `rate` tokens per second up to `capacity` tokens. `reserve` takes
+    a token from the bucket, and if the bucket is empty it reserves the next free slot, so
+    concurrent callers are spread over time instead of retrying at the same moment.
+
+    Example:
+        bucket = TokenBucket('monobank', rate=0.5, capacity=1)
+        wait = bucket.reserve(max_wait=60)
+        if wait is None:
+            ...  # no slot within 60 seconds, try again later
+        elif wait > 0:
+            ...  # run the request in `wait` seconds
+    """
+    SCRIPT = """
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local max_wait = tonumber(ARGV[4])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'timestamp')
+        local tokens = tonumber(state[1]) or capacity
+        local timestamp = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * rate)
+        local wait = math.max(0, (1 - tokens) / rate)
+        if wait > max_wait then
+            return tostring(-wait)
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'timestamp', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil((capacity + max_wait * rate) / rate) + 1)
+        return tostring(wait)
+    """
+
+    def __init__(self, name, rate, capacity=1, connection=None):
+        self.key = f'token_bucket:{name}'
+        self.rate = rate
+        self.capacity = capacity
+        self.connection = connection or get_redis_connection()
+        self._script = self.connection.register_script(self.SCRIPT)
+
+    def reserve(self, max_wait=0) -> float | None:
+        """
+        Reserves a token.
+
+        Parameters:
+        - max_wait (float): The maximal number of seconds to wait for a token.
+
+        Returns:
+        - float | None: Seconds until the reserved token may be used (0 if it is available now),
+          or None if no token is available within `max_wait` seconds.
+        """
+        wait = float(self._script(keys=[self.key], args=[self.rate, self.capacity, time(), max_wait]))
+        return None if wait < 0 else wait
+
+
+class RedisLock:
+    """
+    Lock shared across processes, held in Redis until released or expired.
+
+    The lock is set with `SET NX PX` and holds the token of its owner, so it may only be
+    extended or released by the owner, even after it expired and was taken by another one.
+
+    Example:
+        lock = RedisLock('poll_run', timeout=900)
+        if lock.acquire(token):
+            try:
+                ...
+            finally:
+                lock.release(token)
+    """
+    EXTEND_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    RELEASE_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, name, timeout, connection=None):
+        self.key = f'lock:{name}'
+        self.timeout = timeout
+        self.connection = connection or get_redis_connection()
+        self._extend = self.connection.register_script(self.EXTEND_SCRIPT)
+        self._release = self.connection.register_script(self.RELEASE_SCRIPT)
+
+    def acquire(self, token) -> bool:
+        """
+        Acquires the lock for `timeout` seconds.
+
+        Parameters:
+        - token (str): Unique token of the owner.
+
+        Returns:
+        - bool: True if the lock was acquired, False if it is held by another owner.
+        """
+        return bool(self.connection.set(self.key, token, nx=True, px=int(self.timeout * 1000)))
+
+    def extend(self, token) -> bool:
+        """
+        Resets the expiration of the lock to `timeout` seconds.
+
+        Returns:
+        - bool: True if the lock is held by the owner of the token.
+        """
+        return bool(self._extend(keys=[self.key], args=[token, int(self.timeout * 1000)]))
+
+    def release(self, token) -> bool:
+        """
+        Releases the lock.
+
+        Returns:
+        - bool: True if the lock was held by the owner of the token.
+        """
+        return bool(self._release(keys=[self.key], args=[token]))
+
+    def ttl(self) -> float:
+        """
+        Returns the seconds until the lock expires, or 0 if it isn't held.
+        """
+        return max(0, self.connection.pttl(self.key)) / 1000
@@ -0,0 +1,120 @@
+from itertools import groupby
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from cloudinary import api as cloudinary_api
+from cloudinary.exceptions import Error as CloudinaryError
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from shared.cloudinary.utils import IMAGE_FAILED, IMAGE_READY, release_image, remove_spooled_image, upload_image
+from shared.models import CloudinaryDeletion
+
+
+logger = get_task_logger(__name__)
+
+
+@shared_task(bind=True)
+def upload_spooled_image(self, model_label, pk, field_name, path):
+    """
+    Uploads a spooled image to Cloudinary and sets it to the image field of the instance.
+
+    The instance is saved with only the image, its status and modification date, so the old
+    image is deleted by the pre_save signals as with a synchronous upload. Failed uploads are
+    retried `IMAGE_UPLOAD_RETRIES` times, then the status is set to failed and, if the instance
+    has no image, its alt text is cleared.
+
+    Parameters:
+    - model_label (str): Label of the model, e.g. `jars.Jar`.
+    - pk (int): Primary key of the instance.
+    - field_name (str): The name of the image field.
+    - path (str): The path of the spooled image.
+    """
+    model = apps.get_model(model_label)
+    status_field = f'{field_name}_status'
+    try:
+        instance = model.objects.get(pk=pk)
+    except model.DoesNotExist:
+        remove_spooled_image(path)
+        return
+
+    try:
+        image = upload_image(instance, field_name, path)
+    except (CloudinaryError, OSError) as e:
+        if self.request.retries < settings.IMAGE_UPLOAD_RETRIES:
+            raise self.retry(exc=e, countdown=settings.IMAGE_UPLOAD_RETRY_DELAY)
+        logger.error(f'Failed to upload {field_name} of {model_label} {pk}: {e}')
+        failed = {status_field: IMAGE_FAILED}
+        if not getattr(instance, field_name, None):
+            # The alt text was kept for the pending image, which will never exist
+            failed['img_alt'] = None
+        model.objects.filter(pk=pk).update(**failed)
+        remove_spooled_image(path)
+        return
+
+    setattr(instance, field_name, image)
+    setattr(instance, status_field, IMAGE_READY)
+    update_fields = [field_name, status_field]
+    if any(field.name == 'modified_at' for field in model._meta.concrete_fields):
+        update_fields.append('modified_at')
+    try:
+        # The old image released by the pre_save signals is kept if the save fails
+        with transaction.atomic():
+            instance.save(update_fields=update_fields)
+    except DatabaseError:
+        # The instance was deleted during the upload, with its old image
+        release_image(image)
+    remove_spooled_image(path)
+
+
+@shared_task()
+def drain_cloudinary_deletions():
+    """
+    Deletes the images recorded in the CloudinaryDeletion outbox from Cloudinary.
+
+    The images are deleted with the bulk delete resources API in batches of up to
+    `CLOUDINARY_DELETION_BATCH_SIZE` and their rows removed. Failed deletions are counted
+    and retried by the next run, up to `CLOUDINARY_DELETION_MAX_ATTEMPTS` times.
+
+    Returns:
+        int: The number of deleted images.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                CloudinaryDeletion.objects.select_for_update(skip_locked=True)
+                .filter(attempts__lt=settings.CLOUDINARY_DELETION_MAX_ATTEMPTS)
+                .order_by('type', 'resource_type', 'id')[:settings.CLOUDINARY_DELETION_BATCH_SIZE]
+            )
+            if not batch:
+                return deleted
+            done, failed = _delete_resources(batch)
+            CloudinaryDeletion.objects.filter(pk__in=done).delete()
+            CloudinaryDeletion.objects.filter(pk__in=failed).update(attempts=F('attempts') + 1)
+        deleted += len(done)
+        if failed:
+            return deleted
+
+
+def _delete_resources(batch) -> tuple[list, list]:
+    """Deletes the images of a batch, returning the ids of the done and the failed deletions."""
+    done, failed = [], []
+    for (delivery_type, resource_type), deletions in groupby(batch, key=lambda item: (item.type, item.resource_type)):
+        deletions = list(deletions)
+        try:
+            result = cloudinary_api.delete_resources(
+                list({deletion.public_id for deletion in deletions}), type=delivery_type, resource_type=resource_type)
+        except CloudinaryError as e:
+            logger.warning(f'Failed to delete {len(deletions)} images from Cloudinary: {e}')
+            failed += [deletion.pk for deletion in deletions]
+            continue
+        statuses = result.get('deleted', {})
+        for deletion in deletions:
+            if statuses.get(deletion.public_id) in ('deleted', 'not_found'):
+                done.append(deletion.pk)
+            else:
+                failed.append(deletion.pk)
+    return done, failed
@@ -2,7 +2,6 @@ from __future__ import absolute_import, unicode_literals
 import os
 from django.conf import settings
 from celery import Celery
-from celery.schedules import crontab
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zcy_donation.settings')
@@ -33,8 +32,16 @@ def retry_task(self, text):
 
 
 app.conf.beat_schedule = {
-    'run-get_statistic_for_jar': {
-        'task': 'apps.jars.tasks.get_statistic_for_jar',
-        'schedule': crontab(hour=20, minute=10),
-    }
+    'run-schedule_polls': {
+        'task': 'apps.jars.tasks.schedule_polls',
+        'schedule': 60.0,
+    },
+    'run-write_snapshots': {
+        'task': 'apps.jars.tasks.write_snapshots',
+        'schedule': 30.0,
+    },
+    'run-drain_cloudinary_deletions': {
+        'task': 'shared.tasks.drain_cloudinary_deletions',
+        'schedule': 60.0,
+    },
 }
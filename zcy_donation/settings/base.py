@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from os import getenv
 from pathlib import Path
+from tempfile import gettempdir
 from dotenv import load_dotenv
 
 
@@ -129,3 +130,28 @@ CLOUDINARY = {
     'api_key': getenv('API_KEY'),
     'api_secret': getenv('API_SECRET'),
 }
+# Folders of the CloudinaryFields which the browser may upload to directly
+CLOUDINARY_SIGNED_UPLOAD_FOLDERS = ['jar_title_img', 'jar_album', 'photo_profile']
+# Number of images deleted from Cloudinary at once (at most 100)
+CLOUDINARY_DELETION_BATCH_SIZE = 100
+# Failed attempts after which an image is no longer deleted automatically
+CLOUDINARY_DELETION_MAX_ATTEMPTS = 5
+# Upload images to Cloudinary in a Celery task instead of the request. Only enable it when
+# IMAGE_UPLOAD_SPOOL_DIR is a volume shared by the web and Celery worker containers
+IMAGE_UPLOAD_ASYNC = eval(getenv('IMAGE_UPLOAD_ASYNC', 'False').capitalize())
+# Directory where images wait for the upload task, which must be shared by the web and Celery workers
+IMAGE_UPLOAD_SPOOL_DIR = getenv('IMAGE_UPLOAD_SPOOL_DIR', str(Path(gettempdir()) / 'zcy_donation_uploads'))
+# Number of images of one request uploaded at once, when uploading synchronously
+IMAGE_UPLOAD_POOL_SIZE = 4
+# Retries of failed uploads and the seconds between them
+IMAGE_UPLOAD_RETRIES = 3
+IMAGE_UPLOAD_RETRY_DELAY = 30
+# Strip the metadata of uploaded images, downscale and re-encode them before the upload
+IMAGE_PREPROCESS = eval(getenv('IMAGE_PREPROCESS', 'True').capitalize())
+# Maximal width and height of preprocessed images, in pixels
+IMAGE_PREPROCESS_MAX_DIMENSION = 2048
+# Format and quality (1-100) preprocessed images are encoded with
+IMAGE_PREPROCESS_FORMAT = 'WEBP'
+IMAGE_PREPROCESS_QUALITY = 82
+# Number of processes preprocessing images, per web worker
+IMAGE_PREPROCESS_WORKERS = 2
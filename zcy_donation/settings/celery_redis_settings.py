@@ -1,10 +1,72 @@
+from os import getenv
+
+
 # REDIS settings
 REDIS_HOST = '127.0.0.1'
 REDIS_PORT = '6379'
+REDIS_URL = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/2'
 # CELERY settings
 CELERY_BROKER_URL = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0'
 CELERY_BROKER_TRANSPORT_OPTION = {'visibility_timeout': 3600}
 CELERY_RESULT_BACKEND = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
\ No newline at end of file
+CELERY_RESULT_SERIALIZER = 'json'
+# CACHE settings
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/1',
+        'OPTIONS': {
+            'socket_connect_timeout': 0.5,
+            'socket_timeout': 0.5,
+        },
+    },
+    'fallback': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'zcy-donation-fallback',
+    },
+}
+# Lifetime of cached API responses, in seconds
+RESPONSE_CACHE_TIMEOUT = 60 * 15
+# Lifetime of the cached map of tag names to ids, in seconds
+TAG_IDS_CACHE_TIMEOUT = 60 * 60
+
+# POLLER settings
+# URL of the monobank jar API and the JSON body of its requests
+MONOBANK_API_JAR = getenv('API_JAR')
+MONOBANK_JAR_POST_BODY = getenv('JAR_POST_BODY')
+# Requests per second allowed to the monobank API, shared by all workers
+MONOBANK_RATE_LIMIT = float(getenv('MONOBANK_RATE_LIMIT', 1 / 61))
+# Number of requests which may be sent at once after an idle period
+MONOBANK_RATE_BURST = int(getenv('MONOBANK_RATE_BURST', 1))
+# The longest countdown a poll task is scheduled with while waiting for the rate limit
+MONOBANK_MAX_WAIT = 300
+# Timeouts of requests to the monobank API, in seconds
+MONOBANK_CONNECT_TIMEOUT = 3.05
+MONOBANK_READ_TIMEOUT = 10
+# Retries of requests failed with 429/5xx or connection errors, with exponential backoff
+MONOBANK_RETRIES = 3
+MONOBANK_BACKOFF_FACTOR = 1
+MONOBANK_BACKOFF_MAX = 30
+# Number of keep-alive connections kept open to the monobank API per worker process
+MONOBANK_POOL_SIZE = 10
+# Number of polled jar states written to the database at once
+SNAPSHOT_BATCH_SIZE = 100
+# Number of failed writes of a batch after which its states are written one by one and the
+# failing ones moved to the dead-letter list
+SNAPSHOT_MAX_FAILURES = 5
+# Extend the latest snapshot instead of writing a new one when the sum of jar is unchanged
+SNAPSHOT_DEDUP = True
+# Shared secret of the HMAC signature of pushed jar states
+MONOBANK_WEBHOOK_SECRET = getenv('MONOBANK_WEBHOOK_SECRET')
+# Seconds for which a signed push is accepted after its timestamp
+MONOBANK_WEBHOOK_TOLERANCE = 300
+# The largest number of jar states accepted in one push
+MONOBANK_WEBHOOK_MAX_ITEMS = 500
+# Seconds between runs of the poll scheduler, keep in sync with the beat schedule
+POLL_SCHEDULER_INTERVAL = 60
+# Seconds after which a dispatched but not polled jar is dispatched again
+POLL_SCHEDULER_LEASE = 2 * MONOBANK_MAX_WAIT
+# Seconds after the last poll of a poll run when its lock expires and the run may be resumed
+POLL_RUN_LOCK_TIMEOUT = 900
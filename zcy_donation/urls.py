@@ -23,5 +23,6 @@ urlpatterns = [
         path('auth/', include('apps.auth.urls')),
         path('jars/', include('apps.jars.urls')),
         path('user/', include('apps.user.urls')),
+        path('uploads/', include('shared.cloudinary.urls')),
     ]))
 ]